@@ -0,0 +1,395 @@
+import numpy as np
+
+# Every bijection goes through parenthesizations of length n, which correspond to product orders of
+# n + 1 elements, 231-avoiding permutations of length n and triangulations of an (n + 2)-sided polygon.
+FAMILIES = ("parenthesization", "product_order", "permutation_avoiding_231", "triangulation")
+
+def _is_parenthesization(word):
+  """
+  Checks in O(n) time that word consists of "(" and ")" and that its depth never goes below 0 and
+  ends at 0.
+  """
+  depth = 0
+  for c in word:
+    if c == "(":
+      depth += 1
+    elif c == ")" and depth > 0:
+      depth -= 1
+    else:
+      return False
+  return depth == 0
+
+def _check_parenthesization(word):
+  if not isinstance(word, str) or not _is_parenthesization(word):
+    raise ValueError(f"{word!r} is not a valid parenthesization.")
+  return word
+
+def parenthesization_to_permutation_avoiding_231(parenthesization):
+  """
+  Maps a parenthesization to a 231-avoiding permutation in O(n) time. The i-th entry of the permutation
+  is the position among all ")" of the ")" matching the i-th "(".
+
+  Example:
+  >>> parenthesization_to_permutation_avoiding_231("(())()")
+  (2, 1, 3)
+  """
+  _check_parenthesization(parenthesization)
+  closes = 0
+  stack = []
+  permutation = [0] * (len(parenthesization) // 2)
+  opens = 0
+  for c in parenthesization:
+    if c == "(":
+      stack.append(opens)
+      opens += 1
+    else:
+      closes += 1
+      permutation[stack.pop()] = closes
+  return tuple(permutation)
+
+def permutation_avoiding_231_to_parenthesization(permutation):
+  """
+  Maps a 231-avoiding permutation to a parenthesization in O(n) time by stack sorting it: each entry
+  pushed onto the stack writes "(" and each entry popped off writes ")".
+
+  Example:
+  >>> permutation_avoiding_231_to_parenthesization((2, 1, 3))
+  '(())()'
+  """
+  word = []
+  stack = []
+  closes = 0
+  for x in permutation:
+    word.append("(")
+    stack.append(x)
+    while stack and stack[-1] == closes + 1:
+      stack.pop()
+      word.append(")")
+      closes += 1
+  if stack:
+    raise ValueError(f"{permutation!r} contains the pattern 2-3-1.")
+  return "".join(word)
+
+def _is_product_order(product):
+  """
+  Checks in O(n) time that product is "?" or a product L*R of two factors, where each factor is "?" or a
+  product in parentheses.
+  """
+  # factors[d] counts the factors read so far in the product at nesting depth d.
+  factors = [0]
+  expect_factor = True
+  for c in product:
+    if expect_factor and c == "?":
+      factors[-1] += 1
+      expect_factor = False
+    elif expect_factor and c == "(":
+      factors.append(0)
+    elif not expect_factor and c == "*" and factors[-1] == 1:
+      expect_factor = True
+    elif not expect_factor and c == ")" and len(factors) > 1 and factors[-1] == 2:
+      factors.pop()
+      factors[-1] += 1
+    else:
+      return False
+  return not expect_factor and len(factors) == 1
+
+def product_order_to_parenthesization(product):
+  """
+  Maps a product order of n + 1 elements to a parenthesization of length n in O(n) time. Dropping
+  every "?" and "(", writing "(" for each "*" and adding a final ")" sends the product L*R to the
+  parenthesization of L, then "(", then the parenthesization of R, then ")".
+
+  Example:
+  >>> product_order_to_parenthesization("(?*?)*(?*?)")
+  '()(())'
+  """
+  if not _is_product_order(product):
+    raise ValueError(f"{product!r} is not a valid product order.")
+  if product == "?":
+    return ""
+  return product.replace("?", "").replace("(", "").replace("*", "(") + ")"
+
+def parenthesization_to_product_order(parenthesization):
+  """
+  Maps a parenthesization of length n to a product order of n + 1 elements in O(n) time. This inverts
+  product_order_to_parenthesization: each ")" but the last closes a factor that opens at the start of
+  the enclosing parenthesization, and "?" fills in every empty factor next to a "*".
+
+  Example:
+  >>> parenthesization_to_product_order("()(())")
+  '(?*?)*(?*?)'
+  """
+  _check_parenthesization(parenthesization)
+  if parenthesization == "":
+    return "?"
+  length = len(parenthesization)
+  # factors[p] is the number of factors that open just before position p.
+  factors = [0] * (length + 1)
+  starts = [0]
+  for p, c in enumerate(parenthesization):
+    if c == "(":
+      starts.append(p + 1)
+    else:
+      starts.pop()
+      factors[starts[-1]] += 1
+  # The outermost product is not wrapped in parentheses.
+  factors[0] -= 1
+  product = []
+  for p, c in enumerate(parenthesization[:-1]):
+    product.append("(" * factors[p])
+    if c == "(":
+      if p == 0 or parenthesization[p - 1] != ")":
+        product.append("?")
+      product.append("*")
+      if parenthesization[p + 1] == ")":
+        product.append("?")
+    else:
+      product.append(")")
+  return "".join(product)
+
+def parenthesization_to_triangulation(parenthesization):
+  """
+  Maps a parenthesization of length n to a triangulation of an (n + 2)-sided polygon in O(n) time.
+  The "(" that has k earlier ")" and lies directly inside a pair whose ")" is the m-th ")" gives
+  the internal edge (k, m), or (k, n + 1) when it is not inside any pair. The first "(" gives the
+  side (0, n + 1), which is skipped.
+
+  Example:
+  >>> parenthesization_to_triangulation("(())()")
+  ((0, 2), (2, 4))
+  """
+  _check_parenthesization(parenthesization)
+  n = len(parenthesization) // 2
+  closes = 0
+  levels = [[]]
+  edges = []
+  for c in parenthesization:
+    if c == "(":
+      levels[-1].append(closes)
+      levels.append([])
+    else:
+      closes += 1
+      edges.extend((k, closes) for k in levels.pop())
+  edges.extend((k, n + 1) for k in levels[0][1:])
+  return tuple(sorted(edges))
+
+def triangulation_to_parenthesization(triangulation, n):
+  """
+  Maps a triangulation of an n-sided polygon to a parenthesization of length n - 2 in O(n) time. The
+  k-th ")" is preceded by one "(" for each internal edge from vertex k - 1 to a later vertex, plus one
+  for the side (0, n - 1) when k = 1.
+
+  Example:
+  >>> triangulation_to_parenthesization(((0, 2), (2, 4)), 5)
+  '(())()'
+  """
+  counts = [0] * (n - 1)
+  counts[0] = 1
+  for a, b in triangulation:
+    counts[min(a, b)] += 1
+  word = "".join("(" * counts[k] + ")" for k in range(n - 2))
+  if not _is_parenthesization(word) or parenthesization_to_triangulation(word) != tuple(
+    sorted(tuple(sorted(e)) for e in triangulation)
+  ):
+    raise ValueError(f"{triangulation!r} is not a triangulation of a {n}-sided polygon.")
+  return word
+
+_TO_PARENTHESIZATION = {
+  "parenthesization": lambda obj, n: _check_parenthesization(obj),
+  "product_order": lambda obj, n: product_order_to_parenthesization(obj),
+  "permutation_avoiding_231": lambda obj, n: permutation_avoiding_231_to_parenthesization(obj),
+  "triangulation": triangulation_to_parenthesization,
+}
+
+_FROM_PARENTHESIZATION = {
+  "parenthesization": lambda word: word,
+  "product_order": parenthesization_to_product_order,
+  "permutation_avoiding_231": parenthesization_to_permutation_avoiding_231,
+  "triangulation": parenthesization_to_triangulation,
+}
+
+def convert(obj, source, target, n=None):
+  """
+  Converts a Catalan object between any two of the families in FAMILIES in O(n) time.
+
+  Parameters:
+    obj: The object to convert.
+    source (str): The family of obj.
+    target (str): The family to convert to.
+    n (int): The number of sides of the polygon, only needed when source is "triangulation".
+
+  Returns:
+    The object of the target family corresponding to obj.
+
+  Example:
+  >>> convert((2, 1, 3), "permutation_avoiding_231", "triangulation")
+  ((0, 2), (2, 4))
+  """
+  for family in (source, target):
+    if family not in FAMILIES:
+      raise ValueError(f"Unknown Catalan family {family!r}.")
+  if source == "triangulation" and n is None:
+    raise ValueError("The number of sides n is needed to convert a triangulation.")
+  return _FROM_PARENTHESIZATION[target](_TO_PARENTHESIZATION[source](obj, n))
+
+def parenthesizations_to_array(parenthesizations):
+  """
+  Encodes parenthesizations of the same length as a (batch, 2n) uint8 array with 0 for "(" and 1 for ")".
+
+  Example:
+  >>> parenthesizations_to_array(["(())", "()()"])
+  array([[0, 0, 1, 1],
+         [0, 1, 0, 1]], dtype=uint8)
+  """
+  parenthesizations = list(parenthesizations)
+  length = len(parenthesizations[0]) if parenthesizations else 0
+  data = "".join(parenthesizations).encode("ascii")
+  return (np.frombuffer(data, dtype=np.uint8) - ord("(")).reshape(len(parenthesizations), length)
+
+def array_to_parenthesizations(words):
+  """
+  Decodes a (batch, 2n) array made by parenthesizations_to_array back into a list of strings.
+  """
+  words = np.asarray(words, dtype=np.uint8)
+  data = (words + ord("(")).tobytes().decode("ascii")
+  length = words.shape[1]
+  return [data[i * length:(i + 1) * length] for i in range(words.shape[0])]
+
+def _matching(words):
+  """
+  Matches the parentheses of a (batch, 2n) array of parenthesizations. Each row is scanned from right
+  to left while remembering, for every depth, the nearest ")" to the right that ends at that depth.
+  For the i-th "(" of each row, returns the index among all ")" of the ")" matching it, the number of
+  ")" before it and the index among all ")" of the ")" closing the pair directly around it, or n if
+  there is none.
+  """
+  words = np.asarray(words)
+  batch, length = words.shape
+  n = length // 2
+  if length % 2 or (np.count_nonzero(words, axis=1) != n).any():
+    raise ValueError("The array contains invalid parenthesizations.")
+  rows = np.arange(batch) * (n + 3)
+  # nearest[row * (n + 3) + d + 1] is the position of the nearest ")" ending at depth d. Depth -1
+  # is never reached, so it points past the end, and the last column is scratch space.
+  nearest = np.full(batch * (n + 3), length, dtype=np.int64)
+  dtype = np.min_scalar_type(length)
+  matched = np.empty((length, batch), dtype=dtype)
+  before = np.empty((length, batch), dtype=dtype)
+  around = np.empty((length, batch), dtype=dtype)
+  depth = np.zeros(batch, dtype=np.int64)
+  lowest = np.zeros(batch, dtype=np.int64)
+  for p in range(length - 1, -1, -1):
+    is_open = words[:, p] == 0
+    prior = depth + np.where(is_open, -1, 1)
+    np.minimum(lowest, prior, out=lowest)
+    matched[p] = (nearest[rows + prior + 1] - prior - 1) // 2
+    before[p] = (p - prior) // 2
+    around[p] = (nearest[rows + prior] - prior) // 2
+    nearest[np.where(is_open, rows + n + 2, rows + depth + 1)] = p
+    depth = prior
+  if (lowest < 0).any():
+    raise ValueError("The array contains invalid parenthesizations.")
+  opens = words == 0
+  return tuple(x.T[opens].reshape(batch, n).astype(np.int64) for x in (matched, before, around))
+
+def parenthesizations_to_permutations(words):
+  """
+  Batched parenthesization_to_permutation_avoiding_231 over a (batch, 2n) array from
+  parenthesizations_to_array. Returns a (batch, n) array of permutations of 1, ..., n.
+
+  Example:
+  >>> parenthesizations_to_permutations(parenthesizations_to_array(["(())()"]))
+  array([[2, 1, 3]])
+  """
+  return _matching(words)[0] + 1
+
+def permutations_to_parenthesizations(permutations):
+  """
+  Batched permutation_avoiding_231_to_parenthesization over a (batch, n) array of 231-avoiding
+  permutations. Returns a (batch, 2n) uint8 array in the format of parenthesizations_to_array.
+
+  Example:
+  >>> array_to_parenthesizations(permutations_to_parenthesizations(np.array([[2, 1, 3]])))
+  ['(())()']
+  """
+  permutations = np.asarray(permutations, dtype=np.int64)
+  batch, n = permutations.shape
+  # Stack sorting pops k as soon as 1, ..., k have all been pushed.
+  positions = np.empty_like(permutations)
+  np.put_along_axis(positions, permutations - 1, np.arange(n), axis=1)
+  pushed = np.maximum.accumulate(positions, axis=1) + 1
+  words = np.zeros((batch, 2 * n), dtype=np.uint8)
+  np.put_along_axis(words, pushed + np.arange(n), 1, axis=1)
+  if not np.array_equal(parenthesizations_to_permutations(words), permutations):
+    raise ValueError("The array contains permutations with the pattern 2-3-1.")
+  return words
+
+def parenthesizations_to_triangulations(words):
+  """
+  Batched parenthesization_to_triangulation over a (batch, 2n) array from parenthesizations_to_array.
+  Returns a (batch, n - 1, 2) array of sorted internal edges of (n + 2)-sided polygons.
+
+  Example:
+  >>> parenthesizations_to_triangulations(parenthesizations_to_array(["(())()"])).tolist()
+  [[[0, 2], [2, 4]]]
+  """
+  match, before, around = _matching(words)
+  batch, n = match.shape
+  # The first "(" gives the side (0, n + 1), so it is dropped.
+  edges_a = before[:, 1:]
+  edges_b = around[:, 1:] + 1
+  keys = np.sort(edges_a * (n + 2) + edges_b, axis=1)
+  return np.stack([keys // (n + 2), keys % (n + 2)], axis=2)
+
+def triangulations_to_parenthesizations(triangulations):
+  """
+  Batched triangulation_to_parenthesization over a (batch, n - 3, 2) array of internal edges of
+  n-sided polygons. Returns a (batch, 2n - 4) uint8 array in the format of parenthesizations_to_array.
+
+  Example:
+  >>> array_to_parenthesizations(triangulations_to_parenthesizations(np.array([[[0, 2], [2, 4]]])))
+  ['(())()']
+  """
+  triangulations = np.sort(np.asarray(triangulations), axis=2)
+  batch, edges, _ = triangulations.shape
+  n = edges + 1
+  rows = np.arange(batch)[:, None]
+  counts = np.bincount((rows * (n + 1) + triangulations[:, :, 0]).ravel(), minlength=batch * (n + 1))
+  counts = counts.reshape(batch, n + 1)
+  counts[:, 0] += 1
+  pushed = np.cumsum(counts, axis=1)[:, :n]
+  words = np.zeros((batch, 2 * n), dtype=np.uint8)
+  np.put_along_axis(words, pushed + np.arange(n), 1, axis=1)
+  keys = np.sort(triangulations[:, :, 0] * (n + 2) + triangulations[:, :, 1], axis=1)
+  expected = np.stack([keys // (n + 2), keys % (n + 2)], axis=2)
+  if not np.array_equal(parenthesizations_to_triangulations(words), expected):
+    raise ValueError("The array contains invalid triangulations.")
+  return words
+
+_BATCH_TO_PARENTHESIZATIONS = {
+  "parenthesization": lambda array: np.asarray(array, dtype=np.uint8),
+  "permutation_avoiding_231": permutations_to_parenthesizations,
+  "triangulation": triangulations_to_parenthesizations,
+}
+
+_BATCH_FROM_PARENTHESIZATIONS = {
+  "parenthesization": lambda words: words,
+  "permutation_avoiding_231": parenthesizations_to_permutations,
+  "triangulation": parenthesizations_to_triangulations,
+}
+
+def convert_batch(array, source, target):
+  """
+  Converts a whole array of encoded Catalan objects between two families at once. Parenthesizations
+  are encoded as in parenthesizations_to_array, 231-avoiding permutations as (batch, n) arrays and
+  triangulations as (batch, n - 3, 2) arrays of edges. Product orders have no array encoding, so use
+  convert on the parenthesizations for those.
+
+  Example:
+  >>> convert_batch(np.array([[2, 1, 3]]), "permutation_avoiding_231", "triangulation").tolist()
+  [[[0, 2], [2, 4]]]
+  """
+  for family in (source, target):
+    if family not in _BATCH_TO_PARENTHESIZATIONS:
+      raise ValueError(f"No batched conversion for Catalan family {family!r}.")
+  return _BATCH_FROM_PARENTHESIZATIONS[target](_BATCH_TO_PARENTHESIZATIONS[source](array))
@@ -1,4 +1,154 @@
+import functools
 import itertools
+import math
+import sys
+
+@functools.lru_cache(maxsize=None)
+def ballot_table(n):
+  """
+  Returns the table of ballot numbers used to count partial Dyck words of length 2n.
+
+  Parameters:
+    n (int): The number of pairs of parentheses.
+
+  Returns:
+    A tuple of tuples where entry [r][h] is the number of ways to finish a parenthesization
+    with r characters left to write when the current depth is h.
+
+  Example:
+  >>> ballot_table(2)[4][0]
+  2
+  """
+  table = [[0] * (n + 2) for _ in range(2 * n + 1)]
+  table[0][0] = 1
+  for r in range(1, 2 * n + 1):
+    for h in range(n + 1):
+      table[r][h] = table[r - 1][h + 1] + (table[r - 1][h - 1] if h > 0 else 0)
+  return tuple(tuple(row) for row in table)
+
+@functools.lru_cache(maxsize=None)
+def catalan_number(n):
+  """
+  Returns the n-th Catalan number.
+
+  Example:
+  >>> catalan_number(3)
+  5
+  """
+  if n < 0:
+    return 0
+  return math.comb(2 * n, n) // (n + 1)
+
+def _check_start(start):
+  if start < 0:
+    raise ValueError(f"start must be non-negative, got {start}.")
+
+def _slice(iterator, count, start, stop):
+  """
+  Clamps stop to [start, count] and returns the matching slice of an iterator that already
+  begins at start and ends at count. Counts beyond sys.maxsize, which islice cannot take, are
+  supported.
+  """
+  if stop is None or stop >= count:
+    return iterator
+  remaining = max(stop - start, 0)
+  if remaining <= sys.maxsize:
+    return itertools.islice(iterator, remaining)
+  return (x for _, x in zip(range(remaining), iterator))
+
+def _blocks(m, start, splits):
+  """
+  Walks the splits of a size m Catalan object into a left part of size j and a right part
+  of size m - 1 - j, in the order given by splits. Skips every block before the one holding
+  start and yields (j, left_start, right_start) for that block and every block after it.
+  """
+  for j in splits:
+    right = catalan_number(m - 1 - j)
+    block = catalan_number(j) * right
+    if start >= block:
+      start -= block
+      continue
+    yield j, start // right, start % right
+    start = 0
+
+@functools.lru_cache(maxsize=None)
+def _block_offsets(m):
+  """
+  Returns the prefix sums of the block sizes catalan_number(j) * catalan_number(m - 1 - j) for
+  j = 0, ..., m - 1, so offsets[j] counts the objects in the blocks before j.
+  """
+  offsets = [0]
+  for j in range(m):
+    offsets.append(offsets[-1] + catalan_number(j) * catalan_number(m - 1 - j))
+  return tuple(offsets)
+
+def _check_rank(k, count):
+  if not 0 <= k < count:
+    raise ValueError(f"Rank {k} is out of range for {count} objects.")
+
+def _unrank_dyck(n, k):
+  """
+  Returns the k-th parenthesization of length 2n in lexicographic order as a list of characters.
+  """
+  table = ballot_table(n)
+  word = []
+  h = 0
+  for r in range(2 * n, 0, -1):
+    # Words starting with "(" come first, since "(" < ")".
+    opened = table[r - 1][h + 1] if h + 1 <= n else 0
+    if k < opened:
+      word.append("(")
+      h += 1
+    else:
+      k -= opened
+      word.append(")")
+      h -= 1
+  return word
+
+def _iter_dyck(n, start):
+  word = _unrank_dyck(n, start)
+  while True:
+    yield "".join(word)
+    # Find the rightmost "(" that can be closed instead, then complete the word with as many
+    # "(" as possible followed by ")".
+    h = 0
+    for i in range(2 * n - 1, -1, -1):
+      if word[i] == ")":
+        h += 1
+      else:
+        h -= 1
+        if h >= 1:
+          break
+    else:
+      return
+    word[i] = ")"
+    opened = word[:i + 1].count("(")
+    word[i + 1:] = ["("] * (n - opened) + [")"] * (2 * n - i - 1 - (n - opened))
+
+def iter_parenthesizations(n, start=0, stop=None):
+  """
+  Lazily generates the parenthesizations of length n in lexicographic order.
+
+  Only O(n) working memory is used and the objects before start are skipped without being generated,
+  so a worker can take a contiguous chunk of the full list.
+
+  Parameters:
+    n (int): The length of the parenthesizations.
+    start (int): The index of the first parenthesization to generate.
+    stop (int): The index one past the last parenthesization to generate, or None to run to the end.
+
+  Returns:
+    A generator of strings, where each string represents a valid parenthesization of length n.
+
+  Example:
+  >>> list(iter_parenthesizations(3, 1, 3))
+  ['(()())', '(())()']
+  """
+  _check_start(start)
+  count = catalan_number(n)
+  if start >= count:
+    return iter(())
+  return _slice(_iter_dyck(n, start), count, start, stop)
 
 def parenthesizations(n):
   """
@@ -9,16 +159,89 @@ def parenthesizations(n):
 
   Returns:
     A set of strings, where each inner string represents a valid parenthesization of length n.
-  
+
   Example:
   >>> parenthesizations(3)
   {'((()))', '(()())', '(())()', '()(())', '()()()'}
   """
+  return set(iter_parenthesizations(n))
+
+def rank_parenthesization(parenthesization):
+  """
+  Returns the index of a parenthesization in the order of iter_parenthesizations, in O(n) time.
+
+  Example:
+  >>> rank_parenthesization("(())()")
+  2
+  """
+  n = len(parenthesization) // 2
+  table = ballot_table(n)
+  k = 0
+  h = 0
+  for i, c in enumerate(parenthesization):
+    r = 2 * n - i
+    if c == "(":
+      h += 1
+    elif c == ")":
+      # Skip every word that has "(" here instead.
+      k += table[r - 1][h + 1] if h + 1 <= n else 0
+      h -= 1
+    else:
+      raise ValueError(f"Unexpected character {c!r} in {parenthesization!r}.")
+    if h < 0:
+      raise ValueError(f"{parenthesization!r} is not a valid parenthesization.")
+  if h != 0 or len(parenthesization) % 2:
+    raise ValueError(f"{parenthesization!r} is not a valid parenthesization.")
+  return k
+
+def unrank_parenthesization(n, k):
+  """
+  Returns the k-th parenthesization of length n in the order of iter_parenthesizations, in O(n) time.
+
+  Example:
+  >>> unrank_parenthesization(3, 2)
+  '(())()'
+  """
+  _check_rank(k, catalan_number(n))
+  return "".join(_unrank_dyck(n, k))
+
+def _factor(product):
+  return product if len(product) == 1 else "(" + product + ")"
+
+def _iter_product_orders(n, start):
+  if n == 1:
+    yield "?"
+    return
+  # A product of n elements splits as (j + 1 elements) * (n - j - 1 elements).
+  for j, left_start, right_start in _blocks(n - 1, start, range(n - 2, -1, -1)):
+    for i, left in enumerate(_iter_product_orders(j + 1, left_start)):
+      for right in _iter_product_orders(n - j - 1, right_start if i == 0 else 0):
+        yield _factor(left) + "*" + _factor(right)
+
+def iter_product_orders(n, start=0, stop=None):
+  """
+  Lazily generates the ways to multiply n elements, ordered by the size of the left factor of
+  the outermost product from largest to smallest and then recursively by the factors.
+
+  Parameters:
+    n (int): The number of elements multiplied.
+    start (int): The index of the first product order to generate.
+    stop (int): The index one past the last product order to generate, or None to run to the end.
+
+  Returns:
+    A generator of strings where each string represents a way to multiply n elements.
+
+  Example:
+  >>> list(iter_product_orders(4))
+  ['((?*?)*?)*?', '(?*(?*?))*?', '(?*?)*(?*?)', '?*((?*?)*?)', '?*(?*(?*?))']
+  """
+  _check_start(start)
   if n == 0:
-    return {""}
-  else:
-    # TODO
-    pass
+    return _slice(iter([""]), 1, start, stop)
+  count = catalan_number(n - 1)
+  if start >= count:
+    return iter(())
+  return _slice(_iter_product_orders(n, start), count, start, stop)
 
 def product_orders(n):
   """
@@ -29,40 +252,241 @@ def product_orders(n):
 
   Returns:
     A set of strings where each string represents a way to multiply n elements.
-  
+
   Example:
   >>> product_orders(4)
   {'((?*?)*?)*?', '(?*(?*?))*?', '(?*?)*(?*?)', '?*((?*?)*?)', '?*(?*(?*?))'}
   """
+  return set(iter_product_orders(n))
+
+def _combine_factors(factors):
+  """
+  Returns the number of elements and the rank of the product of one or two parsed factors, each given
+  as (number of elements, rank).
+  """
+  if len(factors) == 1:
+    return factors[0]
+  (left_size, left_rank), (right_size, right_rank) = factors
+  n = left_size + right_size
+  # Left factors of j + 1 elements come after all larger left factors.
+  offsets = _block_offsets(n - 1)
+  j = left_size - 1
+  return n, offsets[-1] - offsets[j + 1] + left_rank * catalan_number(right_size - 1) + right_rank
+
+def rank_product_order(product):
+  """
+  Returns the index of a product order in the order of iter_product_orders, in O(n^2) time.
+
+  Example:
+  >>> rank_product_order("(?*?)*(?*?)")
+  2
+  """
+  if product == "":
+    return 0
+  error = ValueError(f"{product!r} is not a valid product order.")
+  # factors[d] holds the parsed factors of the product open at nesting depth d, so nesting only grows
+  # this list instead of the call stack.
+  factors = [[]]
+  expect_factor = True
+  for c in product:
+    if expect_factor and c == "?":
+      factors[-1].append((1, 0))
+      expect_factor = False
+    elif expect_factor and c == "(":
+      factors.append([])
+    elif not expect_factor and c == "*" and len(factors[-1]) == 1:
+      expect_factor = True
+    elif not expect_factor and c == ")" and len(factors) > 1:
+      size, k = _combine_factors(factors.pop())
+      if size == 1:
+        raise error
+      factors[-1].append((size, k))
+    else:
+      raise error
+  if expect_factor or len(factors) > 1:
+    raise error
+  return _combine_factors(factors[0])[1]
+
+def unrank_product_order(n, k):
+  """
+  Returns the k-th way to multiply n elements in the order of iter_product_orders, in O(n^2) time.
+
+  Example:
+  >>> unrank_product_order(4, 2)
+  '(?*?)*(?*?)'
+  """
+  if n == 0:
+    _check_rank(k, 1)
+    return ""
+  _check_rank(k, catalan_number(n - 1))
+  # The stack holds strings still to be written and (size, rank) pairs of factors still to be unranked,
+  # with the next one on top.
+  product = []
+  stack = [(n, k)]
+  while stack:
+    item = stack.pop()
+    if isinstance(item, str):
+      product.append(item)
+      continue
+    m, k = item
+    if m == 1:
+      product.append("?")
+      continue
+    j, left_rank, right_rank = next(_blocks(m - 1, k, range(m - 2, -1, -1)))
+    # Push the right factor, "*" and the left factor, so that they come off the stack in reverse.
+    for part in ((m - j - 1, right_rank), "*", (j + 1, left_rank)):
+      if part != "*" and part[0] > 1:
+        stack.extend([")", part, "("])
+      else:
+        stack.append(part)
+  return "".join(product)
+
+def _iter_231(n, start):
   if n == 0:
-    return {""}
-  elif n == 1:
-    return {"?"}
-  elif n == 2:
-    return {"?*?"}
-  else:
-    # TODO
-    pass
+    yield ()
+    return
+  # A 231-avoiding permutation starting with j + 1 is j + 1, then a 231-avoiding permutation of
+  # 1, ..., j, then a 231-avoiding permutation of j + 2, ..., n.
+  for j, left_start, right_start in _blocks(n, start, range(n)):
+    for i, left in enumerate(_iter_231(j, left_start)):
+      for right in _iter_231(n - j - 1, right_start if i == 0 else 0):
+        yield (j + 1,) + left + tuple(x + j + 1 for x in right)
+
+def iter_permutations_avoiding_231(n, start=0, stop=None):
+  """
+  Lazily generates the permutations of length n avoiding the pattern 2-3-1 in lexicographic order.
+
+  Parameters:
+    n (int): The length of the permutation.
+    start (int): The index of the first permutation to generate.
+    stop (int): The index one past the last permutation to generate, or None to run to the end.
+
+  Returns:
+    A generator of permutations of length n that do not contain the pattern 2-3-1.
+
+  Example:
+  >>> list(iter_permutations_avoiding_231(3))
+  [(1, 2, 3), (1, 3, 2), (2, 1, 3), (3, 1, 2), (3, 2, 1)]
+  """
+  _check_start(start)
+  count = catalan_number(n)
+  if start >= count:
+    return iter(())
+  return _slice(_iter_231(n, start), count, start, stop)
 
 def permutations_avoiding_231(n):
   """
   Returns a set of permutations of length n avoiding the pattern 2-3-1.
-  
+
   Parameters:
     n (int): The length of the permutation.
-  
+
   Returns:
     A set of permutations of length n that do not contain the pattern 2-3-1.
-  
+
   Example:
   >>> permutations_avoiding_231(4)
   {(1, 2, 3, 4), (1, 2, 4, 3), (1, 3, 2, 4), (1, 4, 2, 3), (1, 4, 3, 2), (2, 1, 3, 4), (2, 1, 4, 3), (3, 1, 2, 4), (3, 2, 1, 4), (4, 1, 2, 3), (4, 1, 3, 2), (4, 2, 1, 3), (4, 3, 1, 2), (4, 3, 2, 1)}
   """
+  return set(iter_permutations_avoiding_231(n))
+
+def rank_permutation_avoiding_231(permutation):
+  """
+  Returns the index of a 231-avoiding permutation in the order of iter_permutations_avoiding_231,
+  in O(n^2) time.
+
+  Example:
+  >>> rank_permutation_avoiding_231((3, 1, 2))
+  3
+  """
+  n = len(permutation)
+  if sorted(permutation) != list(range(1, n + 1)):
+    raise ValueError(f"{permutation!r} is not a permutation.")
+  k = 0
+  # Rank the parts of the decomposition one at a time, so each step only looks at the values
+  # low, ..., low + n - 1 occupying permutation[i:i + n].
+  stack = [(0, n, 1, 1)]
+  while stack:
+    i, n, low, scale = stack.pop()
+    if n == 0:
+      continue
+    j = permutation[i] - low
+    left = permutation[i + 1:i + j + 1]
+    if left and max(left) >= permutation[i]:
+      raise ValueError(f"{permutation!r} contains the pattern 2-3-1.")
+    right_count = catalan_number(n - j - 1)
+    k += scale * _block_offsets(n)[j]
+    stack.append((i + 1, j, low, scale * right_count))
+    stack.append((i + j + 1, n - j - 1, low + j + 1, scale))
+  return k
+
+def unrank_permutation_avoiding_231(n, k):
+  """
+  Returns the k-th 231-avoiding permutation of length n in the order of iter_permutations_avoiding_231,
+  in O(n^2) time.
+
+  Example:
+  >>> unrank_permutation_avoiding_231(3, 3)
+  (3, 1, 2)
+  """
+  _check_rank(k, catalan_number(n))
+  permutation = [0] * n
+  # Each entry (i, m, low, k) asks for the k-th 231-avoiding arrangement of low, ..., low + m - 1
+  # in permutation[i:i + m].
+  stack = [(0, n, 1, k)]
+  while stack:
+    i, m, low, k = stack.pop()
+    if m == 0:
+      continue
+    j, left_rank, right_rank = next(_blocks(m, k, range(m)))
+    permutation[i] = low + j
+    stack.append((i + 1, j, low, left_rank))
+    stack.append((i + j + 1, m - j - 1, low + j + 1, right_rank))
+  return tuple(permutation)
+
+def _iter_triangulations(a, b, start):
+  if b - a < 2:
+    yield ()
+    return
+  # The edge (a, b) lies in exactly one triangle (a, a + j + 1, b), which splits the rest of the
+  # polygon into the polygons a, ..., a + j + 1 and a + j + 1, ..., b.
+  for j, left_start, right_start in _blocks(b - a - 1, start, range(b - a - 1)):
+    k = a + j + 1
+    edges = ()
+    if k > a + 1:
+      edges += ((a, k),)
+    if k < b - 1:
+      edges += ((k, b),)
+    for i, left in enumerate(_iter_triangulations(a, k, left_start)):
+      for right in _iter_triangulations(k, b, right_start if i == 0 else 0):
+        yield left + right + edges
+
+def iter_triangulations(n, start=0, stop=None):
+  """
+  Lazily generates the triangulations of an n-sided polygon, ordered by the third vertex of the
+  triangle on the edge (0, n-1) and then recursively by the two polygons on either side of it.
+
+  Parameters:
+    n (int): The number of sides of the polygon.
+    start (int): The index of the first triangulation to generate.
+    stop (int): The index one past the last triangulation to generate, or None to run to the end.
+
+  Returns:
+    A generator of sorted tuples of pairs, where each pair represents an internal edge in the triangulation.
+
+  Example:
+  >>> list(iter_triangulations(5))
+  [((1, 4), (2, 4)), ((1, 3), (1, 4)), ((0, 2), (2, 4)), ((0, 3), (1, 3)), ((0, 2), (0, 3))]
+  """
+  _check_start(start)
   if n < 3:
-    return set(itertools.permutations(range(1, n+1)))
-  else:
-    # TODO
-    pass
+    return iter(())
+  count = catalan_number(n - 2)
+  if start >= count:
+    return iter(())
+  return _slice(
+    (tuple(sorted(t)) for t in _iter_triangulations(0, n - 1, start)), count, start, stop
+  )
 
 def triangulations(n):
   """
@@ -74,15 +498,68 @@ def triangulations(n):
 
   Returns:
     A set of tuple of pairs, where each pair represents an internal edge in the triangulation.
-  
+
   Example:
-  >>> triangulations(3)
+  >>> triangulations(5)
   {((0, 3), (1, 3)), ((1, 4), (2, 4)), ((1, 3), (1, 4)), ((0, 2), (2, 4)), ((0, 2), (0, 3))}
   """
+  return set(iter_triangulations(n))
+
+def rank_triangulation(triangulation, n):
+  """
+  Returns the index of a triangulation of an n-sided polygon in the order of iter_triangulations,
+  in O(n^2) time.
+
+  Example:
+  >>> rank_triangulation(((0, 2), (2, 4)), 5)
+  2
+  """
+  if n < 3:
+    raise ValueError(f"A {n}-sided polygon has no triangulations.")
+  edges = set(tuple(sorted(edge)) for edge in triangulation)
+  if len(edges) != n - 3:
+    raise ValueError(f"{triangulation!r} is not a triangulation of a {n}-sided polygon.")
+  edges |= set((i, i + 1) for i in range(n - 1))
+  k = 0
+  stack = [(0, n - 1, 1)]
+  while stack:
+    a, b, scale = stack.pop()
+    if b - a < 2:
+      continue
+    for j in range(b - a - 1):
+      if (a, a + j + 1) in edges and (a + j + 1, b) in edges:
+        break
+    else:
+      raise ValueError(f"{triangulation!r} is not a triangulation of a {n}-sided polygon.")
+    k += scale * _block_offsets(b - a - 1)[j]
+    stack.append((a, a + j + 1, scale * catalan_number(b - a - j - 2)))
+    stack.append((a + j + 1, b, scale))
+  return k
+
+def unrank_triangulation(n, k):
+  """
+  Returns the k-th triangulation of an n-sided polygon in the order of iter_triangulations,
+  in O(n^2) time.
+
+  Example:
+  >>> unrank_triangulation(5, 2)
+  ((0, 2), (2, 4))
+  """
   if n < 3:
-    return set()
-  elif n == 3:
-    return {tuple()}
-  else:
-    pass
-    # TODO
\ No newline at end of file
+    raise ValueError(f"A {n}-sided polygon has no triangulations.")
+  _check_rank(k, catalan_number(n - 2))
+  edges = []
+  stack = [(0, n - 1, k)]
+  while stack:
+    a, b, k = stack.pop()
+    if b - a < 2:
+      continue
+    j, left_rank, right_rank = next(_blocks(b - a - 1, k, range(b - a - 1)))
+    c = a + j + 1
+    if c > a + 1:
+      edges.append((a, c))
+    if c < b - 1:
+      edges.append((c, b))
+    stack.append((a, c, left_rank))
+    stack.append((c, b, right_rank))
+  return tuple(sorted(edges))
@@ -1,5 +1,9 @@
+import functools
 import itertools
+import math
+import multiprocessing
 import random
+import numpy as np
 
 def is_valid_SYT(candidate):
   """
@@ -14,14 +18,22 @@ def is_valid_SYT(candidate):
   The function checks if the given matrix is a valid SYT matrix by verifying that:
   1. The elements in each column are in strictly increasing order.
   2. The elements in each row are in strictly increasing order.
+  3. The rows have weakly decreasing lengths and the entries are 1, ..., n.
 
   Example:
   >>> is_valid_SYT(((1, 2, 3), (4, 5, 6), (7, 8, 9)))
   True
-  >>> is_valid_SYT(((1, 2, 3), (5, 4), (6))
+  >>> is_valid_SYT(((1, 2, 3), (5, 4), (6,)))
   False
   """
-  return False
+  shape = tuple(len(row) for row in candidate)
+  if any(shape[i] < shape[i + 1] for i in range(len(shape) - 1)):
+    return False
+  if sorted(value for row in candidate for value in row) != list(range(1, sum(shape) + 1)):
+    return False
+  rows_increase = all(row[j] < row[j + 1] for row in candidate for j in range(len(row) - 1))
+  columns_increase = all(candidate[i][j] < candidate[i + 1][j] for i in range(len(shape) - 1) for j in range(shape[i + 1]))
+  return rows_increase and columns_increase
 
 def reshape_perm(perm, shape):
   """
@@ -38,26 +50,267 @@ def reshape_perm(perm, shape):
   >>> reshape_perm((1, 2, 3, 4, 5, 6), (3, 2, 1))
   ((1, 2, 3), (4, 5), (6,))
   """
-  return tuple()
+  starts = itertools.accumulate(shape, initial=0)
+  return tuple(tuple(perm[start:start + row]) for start, row in zip(starts, shape))
+
+def _shape_mask(shape, cols=None):
+  """
+  Returns a (rows, cols) boolean array that is True on the cells of the shape.
+  """
+  cols = max(shape, default=0) if cols is None else cols
+  return np.arange(cols)[None, :] < np.asarray(shape, dtype=np.int64).reshape(-1, 1)
+
+def reshape_perms(perms, shape):
+  """
+  Batched form of reshape_perm. Fills the cells of the shape in reading order with the rows of perms.
+
+  Parameters:
+  - perms (np.ndarray): An integer array of shape (batch, n), one permutation per row.
+  - shape (Tuple[int]): The shape of the resulting tableaux, with sum(shape) == n.
+
+  Returns:
+  - np.ndarray: An array of shape (batch, len(shape), shape[0]) holding the tableaux, padded with zeros
+    outside the shape.
+
+  Example:
+  >>> reshape_perms(np.array([[1, 2, 3, 4, 5, 6]]), (3, 2, 1)).tolist()
+  [[[1, 2, 3], [4, 5, 0], [6, 0, 0]]]
+  """
+  perms = np.asarray(perms)
+  if perms.ndim != 2 or perms.shape[1] != sum(shape):
+    raise ValueError(f"Expected permutations of length {sum(shape)}, got an array of shape {perms.shape}.")
+  mask = _shape_mask(shape)
+  tableaux = np.zeros((len(perms),) + mask.shape, dtype=perms.dtype)
+  tableaux[:, mask] = perms
+  return tableaux
+
+def is_valid_SYTs(tableaux, shape):
+  """
+  Batched form of is_valid_SYT for candidates stored as a padded integer array, such as the output of
+  reshape_perms. Entries outside the shape are ignored.
+
+  Parameters:
+  - tableaux (np.ndarray): An integer array of shape (batch, rows, cols) with rows >= len(shape) and
+    cols >= shape[0].
+  - shape (Tuple[int]): The weakly decreasing shape shared by the candidates.
+
+  Returns:
+  - np.ndarray: A boolean array of shape (batch,) that is True where the candidate is a valid SYT.
+
+  Example:
+  >>> is_valid_SYTs(reshape_perms(np.array([[1, 2, 3, 4], [1, 3, 2, 4], [1, 4, 2, 3], [1, 2, 2, 4]]), (2, 2)), (2, 2))
+  array([ True,  True, False, False])
+  """
+  tableaux = np.asarray(tableaux)
+  if tableaux.ndim != 3 or tableaux.shape[1] < len(shape) or tableaux.shape[2] < max(shape, default=0):
+    raise ValueError(f"A batch of shape {tableaux.shape} cannot hold tableaux of shape {shape}.")
+  if any(shape[i] < shape[i + 1] for i in range(len(shape) - 1)):
+    raise ValueError(f"{shape} is not a weakly decreasing shape.")
+  cols = max(shape, default=0)
+  cells = tableaux[:, :len(shape), :cols].astype(np.int64)
+  mask = _shape_mask(shape, cols)
+  # Each cell only needs to be compared with its right and lower neighbours that lie in the shape.
+  rows_increase = (cells[:, :, 1:] > cells[:, :, :-1]) | ~mask[:, 1:]
+  columns_increase = (cells[:, 1:, :] > cells[:, :-1, :]) | ~mask[1:, :]
+  valid = rows_increase.all(axis=(1, 2)) & columns_increase.all(axis=(1, 2))
+  # Cells in different rows and columns are never compared, so the entries must also be checked to be 1, ..., n.
+  entries = cells[:, mask]
+  valid &= (entries >= 1).all(axis=1) & (entries <= mask.sum()).all(axis=1)
+  if entries.shape[1]:
+    counts = np.zeros((len(entries), entries.shape[1] + 1), dtype=np.int64)
+    np.put_along_axis(counts, np.clip(entries, 0, entries.shape[1]), 1, axis=1)
+    valid &= counts[:, 1:].sum(axis=1) == entries.shape[1]
+  return valid
+
+@functools.lru_cache(maxsize=None)
+def _count(rows):
+  """
+  Memoized count_SYT for the shapes left after removing corners, which may end in empty rows.
+  """
+  return count_SYT(tuple(row for row in rows if row > 0))
+
+def _corners(rows):
+  # Corners are listed from the top down and taken from the end, so lower rows are tried first.
+  return [i for i in range(len(rows)) if rows[i] > 0 and (i + 1 == len(rows) or rows[i + 1] < rows[i])]
+
+def _removed(rows, i):
+  return tuple(row - 1 if r == i else row for r, row in enumerate(rows))
+
+def _fillings(shape, start=0):
+  """
+  Fills the shape with n, n-1, ..., 1 by repeatedly putting the next number into a corner of the cells
+  that are still empty, so that every branch of the search ends in a distinct SYT. Yields the tableau as a
+  list of lists together with a list whose (k-1)-th entry is the index of the cell holding k in reading
+  order. Both lists are reused, so they must be copied before the next SYT is generated.
+
+  The first start SYTs are skipped by comparing start with the number of SYTs below each corner, without
+  generating them.
+  """
+  n = sum(shape)
+  rows = list(shape)
+  tableau = [[0] * row for row in shape]
+  starts = [sum(shape[:i]) for i in range(len(shape))]
+  positions = [0] * n
+  if n == 0:
+    if start == 0:
+      yield tableau, positions
+    return
+
+  def corners():
+    nonlocal start
+    choices = _corners(rows)
+    while start and choices:
+      count = _count(_removed(rows, choices[-1]))
+      if start < count:
+        break
+      start -= count
+      choices.pop()
+    return choices
+
+  choices = [corners()]
+  placed = []
+  while choices:
+    if not choices[-1]:
+      choices.pop()
+      if placed:
+        rows[placed.pop()] += 1
+      continue
+    i = choices[-1].pop()
+    k = n - len(placed)
+    rows[i] -= 1
+    tableau[i][rows[i]] = k
+    positions[k - 1] = starts[i] + rows[i]
+    placed.append(i)
+    if len(placed) == n:
+      yield tableau, positions
+      rows[placed.pop()] += 1
+    else:
+      choices.append(corners())
+
+def iter_SYTs(shape, start=0, stop=None):
+  """
+  Lazily generates the SYTs of the given shape. Each SYT takes O(n) amortized work, so the total time is
+  proportional to the number of SYTs rather than to n!.
+
+  Parameters:
+  - shape (Tuple[int]): The shape of the resulting SYTs as a tuple of integers.
+  - start (int): The rank of the first SYT to generate. Earlier SYTs are skipped without being generated.
+  - stop (int): The rank one past the last SYT to generate, or None to run to the end.
+
+  Returns:
+  - Generator[Tuple[Tuple[int]]]: The valid SYTs of the given shape, in the order of rank_SYT.
+
+  Example:
+  >>> list(iter_SYTs((2, 1)))
+  [((1, 2), (3,)), ((1, 3), (2,))]
+  """
+  fillings = _fillings(shape, start)
+  if stop is not None:
+    fillings = itertools.islice(fillings, max(stop - start, 0))
+  for tableau, _ in fillings:
+    yield tuple(tuple(row) for row in tableau)
+
+def rank_SYT(T):
+  """
+  Returns the position of an SYT in the order of iter_SYTs, using memoized counts of the SYTs of smaller shapes.
+
+  Parameters:
+  - T (Tuple[Tuple[int]]): A valid SYT.
+
+  Returns:
+  - int: The rank of T among the SYTs of its shape.
+
+  Example:
+  >>> rank_SYT(((1, 3), (2,)))
+  1
+  """
+  rows = [len(row) for row in T]
+  cells = {value: (i, j) for i, row in enumerate(T) for j, value in enumerate(row)}
+  if sorted(cells) != list(range(1, sum(rows) + 1)):
+    raise ValueError(f"{T} is not filled with 1, ..., n.")
+  rank = 0
+  for k in range(sum(rows), 0, -1):
+    i, j = cells[k]
+    choices = _corners(rows)
+    if i not in choices or j != rows[i] - 1:
+      raise ValueError(f"{T} is not a valid SYT.")
+    # Corners in lower rows are tried before the one holding k.
+    rank += sum(_count(_removed(rows, c)) for c in choices if c > i)
+    rows[i] -= 1
+  return rank
+
+def unrank_SYT(shape, k):
+  """
+  Returns the SYT of the given shape with rank k in the order of iter_SYTs.
+
+  Example:
+  >>> unrank_SYT((2, 1), 1)
+  ((1, 3), (2,))
+  """
+  if not 0 <= k < count_SYT(shape):
+    raise ValueError(f"Rank {k} is out of range for the shape {shape}.")
+  return next(iter_SYTs(shape, k))
+
+def _positions(shape, start, stop):
+  n = sum(shape)
+  result = np.empty((stop - start, n), dtype=np.int64)
+  for t, (_, positions) in enumerate(itertools.islice(_fillings(shape, start), stop - start)):
+    result[t] = positions
+  return result
 
-def SYTs(shape):
+def SYTs(shape, as_array=False):
   """
   Generates SYTs (Standard Young Tableaux) of on the given shape.
 
   Parameters:
   - shape (Tuple[int]): The shape of the resulting SYTs as a tuple of integers.
+  - as_array (bool): Whether to return the SYTs as a dense array instead of a list of tuples.
 
   Returns:
-  - List[Tuple[Tuple[int]]]: A list of valid SYTs generated based on the given shape.
+  - List[Tuple[Tuple[int]]]: A list of valid SYTs generated based on the given shape. If as_array is True,
+    this is instead an (f, n) integer array whose entry [t, k-1] is the index, in reading order, of the cell
+    holding k in the t-th SYT.
 
   Example:
   >>> SYTs((2, 1))
   [((1, 2), (3,)), ((1, 3), (2,))]
+  >>> SYTs((2, 1), as_array=True)
+  array([[0, 1, 2],
+         [0, 2, 1]])
+  """
+  if not as_array:
+    return list(iter_SYTs(shape))
+  return _positions(shape, 0, count_SYT(shape))
+
+def _write_chunk(args):
+  shape, path, start, stop = args
+  output = np.load(path, mmap_mode="r+")
+  output[start:stop] = _positions(shape, start, stop)
+  output.flush()
+  return stop - start
+
+def write_SYTs(shape, path, processes=None, chunk_size=100000):
   """
+  Enumerates all SYTs of the given shape in parallel and streams them to a .npy file in the array format of
+  SYTs(shape, as_array=True). The ranks are split into disjoint ranges of chunk_size, and each worker process
+  jumps straight to the start of its range and writes its rows into the memory-mapped file, so memory use
+  does not grow with the number of SYTs.
+
+  Parameters:
+  - shape (Tuple[int]): The shape of the SYTs.
+  - path (str): The .npy file to write.
+  - processes (int): The number of worker processes, defaulting to the number of CPUs.
+  - chunk_size (int): The number of SYTs each worker generates at a time.
 
+  Returns:
+  - int: The number of SYTs written.
+  """
+  total = count_SYT(shape)
   n = sum(shape)
-  results = []
-  return results
+  np.lib.format.open_memmap(path, mode="w+", dtype=np.min_scalar_type(max(n - 1, 0)), shape=(total, n)).flush()
+  chunks = [(tuple(shape), path, start, min(start + chunk_size, total)) for start in range(0, total, chunk_size)]
+  with multiprocessing.Pool(processes) as pool:
+    return sum(pool.imap_unordered(_write_chunk, chunks))
 
 def random_SYT(shape):
   """
@@ -93,4 +346,85 @@ def random_SYT_2(shape):
   >>> random_SYT_2((2, 1))
   ((1, 2), (3,))
   """
-  return tuple()
\ No newline at end of file
+  return tuple()
+
+def conjugate(shape):
+  """
+  Returns the conjugate of a shape, i.e. the lengths of its columns.
+
+  Example:
+  >>> conjugate((3, 2, 1))
+  (3, 2, 1)
+  >>> conjugate((4, 1))
+  (2, 1, 1, 1)
+  """
+  return tuple(sum(1 for row in shape if row > j) for j in range(shape[0] if shape else 0))
+
+def count_SYT(shape):
+  """
+  Counts the SYTs of the given shape with the hook length formula f = n! / (product of all hook lengths).
+
+  Parameters:
+  - shape (Tuple[int]): The shape as a weakly decreasing tuple of integers.
+
+  Returns:
+  - int: The number of SYTs of the given shape.
+
+  Example:
+  >>> count_SYT((2, 1))
+  2
+  >>> count_SYT((3, 3))
+  5
+  """
+  columns = conjugate(shape)
+  hooks = 1
+  for i, row in enumerate(shape):
+    for j in range(row):
+      hooks *= (row - j - 1) + (columns[j] - i - 1) + 1
+  return math.factorial(sum(shape)) // hooks
+
+def random_SYT_hook_walk(shape):
+  """
+  Generates a uniformly random Standard Young Tableau (SYT) of the given shape with the hook walk of
+  Greene, Nijenhuis and Wilf.
+
+  Parameters:
+  - shape (Tuple[int]): The shape of the resulting SYT as a tuple of integers.
+
+  Returns:
+  - Tuple[Tuple[int]]: A random valid SYT generated based on the given shape.
+
+  The largest remaining number is placed at a corner found by starting at a uniformly random cell and
+  repeatedly jumping to a uniformly random other cell of its hook until no such cell is left. That corner
+  is removed from the shape and the walk is repeated for the next number. Each placement takes O(n) time,
+  so shapes with hundreds of cells are fast.
+
+  Example:
+  >>> random_SYT_hook_walk((2, 1)) in {((1, 2), (3,)), ((1, 3), (2,))}
+  True
+  """
+  rows = list(shape)
+  columns = list(conjugate(shape))
+  tableau = [[0] * row for row in shape]
+  for k in range(sum(shape), 0, -1):
+    # Pick a uniformly random cell of the remaining shape.
+    index = random.randrange(k)
+    i = 0
+    while index >= rows[i]:
+      index -= rows[i]
+      i += 1
+    j = index
+    while True:
+      arm = rows[i] - j - 1
+      leg = columns[j] - i - 1
+      if arm + leg == 0:
+        break
+      step = random.randrange(arm + leg)
+      if step < arm:
+        j += step + 1
+      else:
+        i += step - arm + 1
+    tableau[i][j] = k
+    rows[i] -= 1
+    columns[j] -= 1
+  return tuple(tuple(row) for row in tableau)
@@ -1,8 +1,10 @@
 import csv
+import numpy as np
 import torch
 from torch.utils.data import Dataset, DataLoader, random_split
 import torch.nn.functional as F
 from torch import nn
+from parenthesizations import pack, unpack_bits
 
 device = "cpu"
 
@@ -19,23 +21,52 @@ def parenthesization_to_tensor(parenthesization):
         Each element in the tensor is either 0 or 1, representing whether the corresponding
         parenthesization character is "(" or ")".
     """
-    # TODO
-    pass
+    codes, _ = pack([parenthesization])
+    return packed_to_tensor(codes, len(parenthesization) // 2)[0]
+
+def packed_to_tensor(codes, n):
+    """
+    Convert packed parenthesizations of length 2*n to a batch of pytorch tensors in one vectorized step.
+
+    Args:
+        codes (np.ndarray): The packed parenthesizations made by `parenthesizations.pack`.
+        n (int): Half the length of the parenthesizations.
+
+    Returns:
+        torch.Tensor: A tensor of shape (batch, 4*n) where each row matches `parenthesization_to_tensor`
+        of the corresponding parenthesization.
+    """
+    bits = torch.from_numpy(unpack_bits(codes, 2 * n).astype(np.int64))
+    return F.one_hot(bits, 2).flatten(1).float()
 
 class ParenthesizationDataset(Dataset):
     def __init__(self, n):
-        self.data = []
+        parenthesizations = []
+        labels = []
         filename = f"data/parenthesizations_{n}.csv"
         with open(filename, 'r') as file:
             csv_reader = csv.DictReader(file)
             for row in csv_reader:
-                self.data.append((parenthesization_to_tensor(row["parenthesization"]), int(row["valid"])))
+                parenthesizations.append(row["parenthesization"])
+                labels.append(int(row["valid"]))
+        self.n = n
+        self.codes, _ = pack(parenthesizations)
+        self.labels = torch.tensor(labels)
 
     def __len__(self):
-        return len(self.data)
+        return len(self.labels)
 
     def __getitem__(self, idx):
-        return self.data[idx]
+        """
+        Returns the one-hot input and the label at `idx`, encoded from the packed codes on demand. A list or
+        array of indices returns a whole batch, encoded with a single call to `packed_to_tensor`.
+        """
+        if isinstance(idx, (int, np.integer)):
+            inputs, labels = self[[idx]]
+            return inputs[0], labels[0]
+        if not isinstance(idx, slice):
+            idx = np.asarray(idx)
+        return packed_to_tensor(self.codes[idx], self.n), self.labels[idx]
 
 class ParenthesizationModel(nn.Module):
     def __init__(self, n):
@@ -1,4 +1,7 @@
-import itertools
+import numpy as np
+
+# Packed parenthesizations store one word per 64-bit integer, where bit i is 1 if character i is ")".
+MAX_PACKED_LENGTH = 64
 
 def valid(n):
   """
@@ -38,5 +41,166 @@ def invalid(n):
   >>> invalid(3)
   {"())())", ")))(((", ...}
   """
-  return set("".join(p) for p in itertools.product("()",repeat=2*n)) - set(valid(n))
+  codes = np.concatenate(list(iter_invalid_packed(n)))
+  return set(unpack(codes, [2 * n] * len(codes)))
+
+def pack(parenthesizations):
+  """
+  Packs parenthesizations of length at most MAX_PACKED_LENGTH into 64-bit integers.
+
+  Parameters:
+    parenthesizations (Iterable[str]): The parenthesizations to pack.
+
+  Returns:
+    A uint64 array of codes, where bit i is 1 if character i is ")", and a uint8 array of lengths.
+
+  Example:
+  >>> pack(["(())", "()"])
+  (array([12,  2], dtype=uint64), array([4, 2], dtype=uint8))
+  """
+  parenthesizations = list(parenthesizations)
+  lengths = np.fromiter((len(p) for p in parenthesizations), dtype=np.uint8, count=len(parenthesizations))
+  if len(lengths) and lengths.max() > MAX_PACKED_LENGTH:
+    raise ValueError(f"Parenthesizations longer than {MAX_PACKED_LENGTH} characters cannot be packed.")
+  data = "".join(p.ljust(MAX_PACKED_LENGTH, "(") for p in parenthesizations)
+  bits = np.frombuffer(data.encode("ascii"), dtype=np.uint8) - ord("(")
+  return pack_bits(bits.reshape(len(parenthesizations), MAX_PACKED_LENGTH)), lengths
+
+def pack_bits(bits):
+  """
+  Packs a (batch, width) array with 0 for "(" and 1 for ")" into 64-bit integers, the inverse of unpack_bits.
+  """
+  bits = np.asarray(bits, dtype=np.uint8)
+  padded = np.zeros((len(bits), MAX_PACKED_LENGTH), dtype=np.uint8)
+  padded[:, :bits.shape[1]] = bits
+  codes = np.packbits(padded, axis=1, bitorder="little").view("<u8").ravel()
+  return codes.astype(np.uint64)
+
+def unpack_bits(codes, width=MAX_PACKED_LENGTH):
+  """
+  Returns the first width characters of packed parenthesizations as a (batch, width) uint8 array
+  with 0 for "(" and 1 for ")".
+  """
+  codes = np.ascontiguousarray(codes, dtype="<u8")
+  bits = np.unpackbits(codes.view(np.uint8).reshape(-1, 8), axis=1, bitorder="little")
+  return bits[:, :width]
+
+def unpack(codes, lengths):
+  """
+  Unpacks codes made by pack back into a list of strings.
+
+  Example:
+  >>> unpack(*pack(["(())", "()"]))
+  ['(())', '()']
+  """
+  data = (unpack_bits(codes) + ord("(")).tobytes().decode("ascii")
+  return [data[i * MAX_PACKED_LENGTH:i * MAX_PACKED_LENGTH + int(length)] for i, length in enumerate(lengths)]
+
+def depth_profiles(codes, lengths, width=None):
+  """
+  Computes the depth after each character of packed parenthesizations.
+
+  Parameters:
+    codes (np.ndarray): The packed parenthesizations.
+    lengths (np.ndarray): The lengths of the parenthesizations.
+    width (int): The number of characters to compute depths for. Defaults to the longest length.
+
+  Returns:
+    A (batch, width) int8 array of depths, which stay at the final depth past the end of each parenthesization.
+
+  Example:
+  >>> depth_profiles(*pack(["(())", "))"]))
+  array([[ 1,  2,  1,  0],
+         [-1, -2, -2, -2]], dtype=int8)
+  """
+  lengths = np.asarray(lengths)
+  if width is None:
+    width = int(lengths.max()) if len(lengths) else 0
+  steps = 1 - 2 * unpack_bits(codes, width).astype(np.int8)
+  steps[np.arange(width) >= lengths[:, None]] = 0
+  return np.cumsum(steps, axis=1, dtype=np.int8)
+
+def is_valid(codes, lengths):
+  """
+  Checks which packed parenthesizations are valid, i.e. never go below depth 0 and end at depth 0.
 
+  Example:
+  >>> is_valid(*pack(["(())", "())(", "(("]))
+  array([ True, False, False])
+  """
+  depths = depth_profiles(codes, lengths)
+  if depths.shape[1] == 0:
+    return np.ones(len(depths), dtype=bool)
+  return (depths.min(axis=1) >= 0) & (depths[:, -1] == 0)
+
+def valid_packed(n):
+  """
+  Returns the packed valid parenthesizations of length 2n, built level by level as "(" + c + ")" + d
+  without going through strings.
+
+  Example:
+  >>> unpack(valid_packed(2), [4, 4])
+  ['()()', '(())']
+  """
+  levels = [np.zeros(1, dtype=np.uint64)]
+  for m in range(1, n + 1):
+    parts = []
+    for i in range(m):
+      c, d = levels[i], levels[m - i - 1]
+      closing = np.uint64(1 << (2 * i + 1))
+      shift = np.uint64(2 * i + 2)
+      parts.append(((c[:, None] << np.uint64(1)) | closing | (d[None, :] << shift)).ravel())
+    levels.append(np.concatenate(parts))
+  return levels[n]
+
+def _check_packed_length(n):
+  if 2 * n > MAX_PACKED_LENGTH:
+    raise ValueError(f"Parenthesizations of length {2 * n} do not fit in {MAX_PACKED_LENGTH} bits.")
+
+def random_valid_packed(n, size, rng=None):
+  """
+  Samples packed valid parenthesizations of length 2n uniformly at random in O(n) time each.
+
+  A uniformly random arrangement of n "(" and n + 1 ")" has exactly one rotation whose depth first goes
+  below 0 at the last character, namely the one starting just after the first lowest point. Dropping that
+  last ")" leaves a uniformly random valid parenthesization (the cycle lemma).
+  """
+  _check_packed_length(n)
+  rng = np.random.default_rng(rng)
+  order = rng.permuted(np.tile(np.arange(2 * n + 1), (size, 1)), axis=1)
+  steps = np.where(order < n, 1, -1).astype(np.int8)
+  lowest = np.argmin(np.cumsum(steps, axis=1), axis=1)
+  rotation = (lowest[:, None] + 1 + np.arange(2 * n)) % (2 * n + 1)
+  return pack_bits(np.take_along_axis(steps, rotation, axis=1) < 0)
+
+def random_invalid_packed(n, size, rng=None):
+  """
+  Samples packed invalid parenthesizations of length 2n uniformly at random by drawing random strings and
+  rejecting the valid ones, which are rare for all but the smallest n.
+  """
+  _check_packed_length(n)
+  if n == 0 and size > 0:
+    raise ValueError("The empty word is valid, so there are no invalid parenthesizations of length 0.")
+  rng = np.random.default_rng(rng)
+  mask = np.uint64((1 << (2 * n)) - 1) if n < 32 else np.uint64(2**64 - 1)
+  result = []
+  found = 0
+  while found < size:
+    # Oversample a little so that most requests finish in one round.
+    count = 2 * (size - found) + 16
+    codes = rng.integers(0, 2**64 - 1, size=count, dtype=np.uint64, endpoint=True) & mask
+    codes = codes[~is_valid(codes, np.full(count, 2 * n))]
+    result.append(codes[:size - found])
+    found += len(result[-1])
+  return np.concatenate(result) if result else np.zeros(0, dtype=np.uint64)
+
+def iter_invalid_packed(n, chunk_size=2**20):
+  """
+  Streams every packed invalid parenthesization of length 2n in increasing order of their codes, in chunks
+  that use memory proportional to chunk_size instead of 4^n.
+  """
+  _check_packed_length(n)
+  lengths = np.full(chunk_size, 2 * n)
+  for start in range(0, 4**n, chunk_size):
+    codes = np.arange(start, min(start + chunk_size, 4**n), dtype=np.uint64)
+    yield codes[~is_valid(codes, lengths[:len(codes)])]
@@ -1,8 +1,20 @@
 import csv
-from torch.utils.data import Dataset, DataLoader, random_split
+import itertools
+import math
+import os
+from torch.utils.data import (
+    BatchSampler,
+    Dataset,
+    DataLoader,
+    RandomSampler,
+    SequentialSampler,
+    random_split,
+)
 import torch.nn.functional as F
 from torch import nn
 import torch
+import numpy as np
+from rsk import rsk_features
 
 
 def permutation_to_tensor(permutation):
@@ -10,28 +22,200 @@ def permutation_to_tensor(permutation):
     return F.one_hot(torch.tensor([c - 1 for c in permutation]), n).float().flatten()
 
 
+def permutations_to_tensor(permutations):
+    """
+    One-hot encodes a batch of permutations, giving the same rows as `permutation_to_tensor`.
+
+    Parameters:
+        permutations (np.ndarray): An integer array of shape (batch, n), one permutation of 1, ..., n per row.
+
+    Returns:
+        torch.Tensor: A float tensor of shape (batch, n**2).
+    """
+    permutations = torch.from_numpy(np.asarray(permutations, dtype=np.int64))
+    n = permutations.shape[1]
+    return F.one_hot(permutations - 1, n).float().flatten(1)
+
+
+def binary_paths(n, directory="data"):
+    """
+    Returns the paths of the binary permutation and statistics files for `permutations_{n}.csv`.
+    """
+    prefix = os.path.join(directory, f"permutations_{n}")
+    return f"{prefix}_permutations.npy", f"{prefix}_stats.npy"
+
+
+def convert_csv(n, directory="data", chunk_size=2**16):
+    """
+    Converts `permutations_{n}.csv` into two binary files that can be memory-mapped: a uint8 array of shape
+    (n!, n) holding the permutations, and a structured array with one int16 field per statistic. Both files
+    are preallocated as memory maps and filled from the CSV `chunk_size` rows at a time, so memory use does
+    not grow with n!.
+
+    Parameters:
+        n (int): The length of the permutations.
+        directory (str): The directory holding the data files.
+        chunk_size (int): The number of rows parsed at once.
+
+    Returns:
+        Tuple[str, str]: The paths of the permutation and statistics files.
+    """
+    paths = binary_paths(n, directory)
+    rows = math.factorial(n)
+    with open(os.path.join(directory, f"permutations_{n}.csv"), "r") as file:
+        csv_reader = csv.reader(file)
+        header = next(csv_reader)
+        # Write to temporary files first so that an interrupted conversion is never loaded.
+        permutations = np.lib.format.open_memmap(
+            f"{paths[0]}.tmp.npy", mode="w+", dtype=np.uint8, shape=(rows, n)
+        )
+        stats = np.lib.format.open_memmap(
+            f"{paths[1]}.tmp.npy",
+            mode="w+",
+            dtype=[(name, np.int16) for name in header[1:]],
+            shape=(rows,),
+        )
+        start = 0
+        while chunk := list(itertools.islice(csv_reader, chunk_size)):
+            stop = start + len(chunk)
+            if stop > rows:
+                raise ValueError(f"permutations_{n}.csv has more than {n}! rows.")
+            permutations[start:stop] = np.array(
+                [row[0].strip("()").split(",") for row in chunk], dtype=np.uint8
+            ).reshape(len(chunk), n)
+            values = np.array([row[1:] for row in chunk], dtype=np.int16)
+            for i, name in enumerate(header[1:]):
+                stats[name][start:stop] = values[:, i]
+            start = stop
+        if start != rows:
+            raise ValueError(f"permutations_{n}.csv has {start} rows instead of {n}!.")
+    permutations.flush()
+    stats.flush()
+    del permutations, stats
+    for path in paths:
+        os.replace(f"{path}.tmp.npy", path)
+    return paths
+
+
+def load_binary(n, directory="data"):
+    """
+    Memory-maps the binary files for `permutations_{n}.csv`, converting the CSV first if they are missing or
+    older than it.
+
+    Returns:
+        Tuple[np.ndarray, np.ndarray]: The permutations and the statistics, as read-only memory maps.
+    """
+    csv_path = os.path.join(directory, f"permutations_{n}.csv")
+    paths = binary_paths(n, directory)
+    if not all(os.path.exists(path) for path in paths) or (
+        os.path.exists(csv_path)
+        and os.path.getmtime(csv_path) > min(os.path.getmtime(path) for path in paths)
+    ):
+        paths = convert_csv(n, directory)
+    return tuple(np.load(path, mmap_mode="r") for path in paths)
+
+
 class PermutationDataset(Dataset):
-    def __init__(self, n, label_name):
-        self.data = []
+    def __init__(self, n, label_name, rsk=False, one_hot=True):
+        """
+        Loads the permutations of length `n` with the statistic `label_name` as labels. The permutations are
+        memory-mapped from the binary files made by `convert_csv` and one-hot encoded when they are indexed.
+
+        Parameters:
+            n (int): The length of the permutations.
+            label_name (str | List[str] | None): The column of the data file to use as labels. A list of columns
+                (or None for all of them) loads them together for a multi-head `PermutationModel`, and the
+                labels of each item are then a tensor with one entry per column.
+            rsk (bool): Whether to append the RSK shape features from `rsk.rsk_features` (2n values) to the
+                one-hot encoding of each permutation. The model then needs `extra_features=2 * n`.
+            one_hot (bool): Whether to one-hot encode the permutations. Otherwise the inputs are the raw
+                permutations as int64 tensors of shape (batch, n), which `PermutationModel` accepts directly.
+        """
+        if rsk and not one_hot:
+            raise ValueError(
+                "RSK features can only be appended to one-hot encoded inputs."
+            )
         self.n = n
-        self.label_counts = []
-        with open(f"data/permutations_{n}.csv", "r") as file:
-            csv_reader = csv.DictReader(file)
-            for row in csv_reader:
-                permutation = eval(row["permutation"])
-                label = eval(row[label_name])
-                while label >= len(self.label_counts):
-                    self.label_counts.append(0)
-                self.data.append((permutation_to_tensor(permutation), label))
-                self.label_counts[label] += 1
+        self.one_hot = one_hot
+        self.permutations, stats = load_binary(n)
+        self.multi_task = not isinstance(label_name, str)
+        self.label_names = (
+            list(label_name or stats.dtype.names) if self.multi_task else [label_name]
+        )
+        labels = torch.from_numpy(
+            np.stack([stats[name] for name in self.label_names], axis=1).astype(
+                np.int64
+            )
+        )
+        self.labels = labels if self.multi_task else labels[:, 0]
+        label_counts = [torch.bincount(column).tolist() for column in labels.T]
+        self.label_counts = label_counts if self.multi_task else label_counts[0]
+        self.features = (
+            torch.from_numpy(rsk_features(self.permutations))
+            if rsk and len(self.permutations)
+            else None
+        )
+
+    def num_classes(self):
+        """
+        Returns the number of classes of the statistic, or a list with one entry per statistic in multi-task mode.
+        """
+        if self.multi_task:
+            return [len(counts) for counts in self.label_counts]
+        return len(self.label_counts)
 
     def class_weights(self):
+        if self.multi_task:
+            return [
+                1 / torch.tensor(counts).clamp(min=1) for counts in self.label_counts
+            ]
         return torch.tensor(
             [1 / self.label_counts[i] for i in range(len(self.label_counts))]
         )
 
     def __len__(self):
-        return len(self.data)
+        return len(self.permutations)
 
     def __getitem__(self, idx):
-        return self.data[idx]
+        """
+        Returns the encoded input and the label at `idx`. An array of indices gives a whole batch at once,
+        with inputs of shape (batch, n**2) (plus the RSK features, if enabled), or (batch, n) without one-hot
+        encoding.
+        """
+        if isinstance(idx, (int, np.integer)):
+            inputs, labels = self[[idx]]
+            return inputs[0], labels[0] if self.multi_task else labels[0].item()
+        if not isinstance(idx, slice):
+            idx = np.asarray(idx)
+        if not self.one_hot:
+            return (
+                torch.from_numpy(self.permutations[idx].astype(np.int64)),
+                self.labels[idx],
+            )
+        inputs = permutations_to_tensor(self.permutations[idx])
+        if self.features is not None:
+            inputs = torch.cat([inputs, self.features[idx]], dim=1)
+        return inputs, self.labels[idx]
+
+
+def batch_loader(dataset, batch_size, shuffle=False, drop_last=False):
+    """
+    Returns a DataLoader that passes whole lists of indices to the dataset, so that each batch is one-hot
+    encoded with one vectorized call instead of being collated out of per-permutation tensors. Works with
+    `PermutationDataset` and with the subsets made from it by `random_split`.
+
+    Parameters:
+        dataset (torch.utils.data.Dataset): The dataset to load from.
+        batch_size (int): The number of permutations in each batch.
+        shuffle (bool): Whether to visit the permutations in a random order each epoch.
+        drop_last (bool): Whether to drop the last batch if it is smaller than `batch_size`.
+
+    Returns:
+        torch.utils.data.DataLoader: A data loader yielding (inputs, labels) batches.
+    """
+    sampler = RandomSampler(dataset) if shuffle else SequentialSampler(dataset)
+    return DataLoader(
+        dataset,
+        sampler=BatchSampler(sampler, batch_size, drop_last),
+        batch_size=None,
+    )
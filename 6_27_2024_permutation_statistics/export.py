@@ -0,0 +1,147 @@
+from matplotlib.figure import Figure
+from matplotlib.backends.backend_pdf import PdfPages
+
+# Figures are created directly rather than through pyplot, so nothing here needs a display and saving
+# always goes through the Agg (PNG) or PDF canvas.
+
+
+class Exporter:
+    def __init__(self, columns=8, tile_size=(2.0, 2.0), dpi=100):
+        """
+        Renders many small plots into tiled pages and saves them without a display. The same Figure is cleared
+        and reused for every page and every call.
+
+        Parameters:
+            columns (int): The number of tiles in each row of a page.
+            tile_size (Tuple[float, float]): The width and height of each tile in inches.
+            dpi (int): The resolution of raster outputs.
+        """
+        self.columns = columns
+        self.tile_size = tile_size
+        self.dpi = dpi
+        self.figure = Figure()
+
+    def page(self, tiles, title=None):
+        """
+        Draws the tiles onto the reused figure in a grid and returns it.
+
+        Parameters:
+            tiles (List[Callable[[Axes], None]]): Functions that each draw one plot onto the axes they are given.
+            title (str): The title of the page.
+
+        Returns:
+            matplotlib.figure.Figure: The figure holding the page.
+        """
+        figure = self.figure
+        figure.clear()
+        columns = max(min(self.columns, len(tiles)), 1)
+        rows = max(-(-len(tiles) // columns), 1)
+        figure.set_size_inches(columns * self.tile_size[0], rows * self.tile_size[1])
+        axes = figure.subplots(rows, columns, squeeze=False)
+        for ax, tile in zip(axes.flat, tiles):
+            tile(ax)
+        for ax in axes.flat[len(tiles) :]:
+            ax.axis("off")
+        if title is not None:
+            figure.suptitle(title)
+        figure.tight_layout()
+        return figure
+
+    def save(self, pages, path):
+        """
+        Saves pages of tiles to `path`. A PDF gets one page per entry of `pages`; any other format (e.g. PNG)
+        gets a single image with all tiles.
+
+        Parameters:
+            pages (List[Tuple[str, List[Callable[[Axes], None]]]]): The title and tiles of each page.
+            path (str): The output file.
+        """
+        if str(path).lower().endswith(".pdf"):
+            with PdfPages(path) as pdf:
+                for title, tiles in pages:
+                    pdf.savefig(self.page(tiles, title))
+        else:
+            tiles = [tile for _, tiles in pages for tile in tiles]
+            self.page(tiles).savefig(path, dpi=self.dpi)
+
+
+_exporter = None
+
+
+def default_exporter():
+    """
+    Returns the shared Exporter used when none is passed, creating it on first use.
+    """
+    global _exporter
+    if _exporter is None:
+        _exporter = Exporter()
+    return _exporter
+
+
+def _heatmap(matrix, max_val, title, xlabels, ylabels=None):
+    def draw(ax):
+        ax.imshow(matrix, cmap="bwr", vmin=-max_val, vmax=max_val)
+        ax.set_xticks(range(len(xlabels)), xlabels, fontsize=6)
+        if ylabels is None:
+            ax.yaxis.set_visible(False)
+        else:
+            ax.set_yticks(range(len(ylabels)), ylabels, fontsize=6)
+        ax.set_title(title, fontsize=8)
+
+    return draw
+
+
+def export_heatmaps(model, path, layers=None, exporter=None):
+    """
+    Saves the heatmap of every row of the given layers of a PermutationModel, as `plot_heatmap_feature`
+    draws them, to a tiled image or (for a .pdf path) a file with one page per layer. Rows of the first layer
+    are drawn as an n by n grid whose row i holds the weights of the one-hot encoding of position i + 1;
+    extra features after the one-hot encoding are left out.
+
+    Parameters:
+        model (PermutationModel): The model whose weights are drawn.
+        path (str): The output file, e.g. "figures/heatmaps.png" or "figures/heatmaps.pdf".
+        layers (List[int]): The layers to draw, defaulting to all of them.
+        exporter (Exporter): The exporter to render with, defaulting to `default_exporter()`.
+    """
+    n = model.n
+    layers = range(len(model.layers)) if layers is None else layers
+    pages = []
+    for layer in layers:
+        weights = model.layers[layer].weight.detach().cpu()
+        max_val = weights.abs().max().item()
+        if layer == 0:
+            matrices = weights[:, : n * n].reshape(-1, n, n).numpy()
+            labels = [str(x + 1) for x in range(n)]
+            tiles = [
+                _heatmap(matrix, max_val, f"Layer {layer}, row {index}", labels, labels)
+                for index, matrix in enumerate(matrices)
+            ]
+        else:
+            labels = [str(x + 1) for x in range(weights.shape[1])]
+            tiles = [
+                _heatmap(row[None, :], max_val, f"Layer {layer}, row {index}", labels)
+                for index, row in enumerate(weights.numpy())
+            ]
+        pages.append((f"Layer {layer}", tiles))
+    (exporter or default_exporter()).save(pages, path)
+
+
+def export_confusion_matrices(confusion_matrices, path, titles=None, exporter=None):
+    """
+    Saves confusion matrices, as `ConfusionMatrix.plot` draws them, to a tiled image or (for a .pdf path) a
+    file with one page per matrix.
+
+    Parameters:
+        confusion_matrices (List[ConfusionMatrix]): The confusion matrices, e.g. from a multi-head model.
+        path (str): The output file.
+        titles (List[str]): The title of each matrix.
+        exporter (Exporter): The exporter to render with, defaulting to `default_exporter()`.
+    """
+    if titles is None:
+        titles = [f"Confusion Matrix {i}" for i in range(len(confusion_matrices))]
+    pages = [
+        (title, [lambda ax, matrix=matrix, title=title: matrix.draw(ax, title)])
+        for matrix, title in zip(confusion_matrices, titles)
+    ]
+    (exporter or default_exporter()).save(pages, path)
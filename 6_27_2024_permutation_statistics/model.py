@@ -1,33 +1,76 @@
 import torch.nn as nn
+import torch.nn.functional as F
 import torch
 import matplotlib.pyplot as plt
+import numpy as np
+from matplotlib.collections import EllipseCollection, LineCollection
+from matplotlib.colors import to_rgba
 
 
 class PermutationModel(nn.Module):
-    def __init__(self, n, layers):
+    def __init__(self, n, layers, extra_features=0, heads=None):
         """
         Initializes a PermutationModel object with the given `n` and a list of layer sizes `layers`.
 
         Parameters:
             n (int): The number of elements in each permutation.
             layers (List[int]): A list of integers representing the number of nodes in each layer of the model.
+            extra_features (int): The number of inputs appended after the one-hot encoded permutation,
+                e.g. 2 * n for `PermutationDataset(n, label_name, rsk=True)`.
+            heads (List[int]): The number of classes of each statistic in multi-task mode, e.g.
+                `dataset.num_classes()` of a multi-task `PermutationDataset`. The `layers` then form a shared
+                trunk, each head is a linear layer on top of it, and the model returns a list of outputs.
         """
         super().__init__()
         self.n = n
+        self.extra_features = extra_features
         self.layers = nn.ModuleList()
         for i in range(len(layers)):
             if i == 0:
-                self.layers.append(nn.Linear(n**2, layers[0]))
+                self.layers.append(nn.Linear(n**2 + extra_features, layers[0]))
             else:
                 self.layers.append(nn.Linear(layers[i - 1], layers[i]))
+        self.heads = None
+        if heads is not None:
+            self.heads = nn.ModuleList(
+                [nn.Linear(layers[-1], num_classes) for num_classes in heads]
+            )
 
     def forward(self, x):
+        """
+        Runs the model on one-hot encoded permutations, or on raw permutations given as an integer tensor of
+        shape (batch, n) with entries 1, ..., n. For raw permutations the first layer sums the weight columns
+        that the one-hot entries would select, which gives the same result with O(n) instead of O(n^2) work
+        per output.
+        """
+        raw = not torch.is_floating_point(x)
+        if raw and self.extra_features:
+            raise ValueError("Raw permutations cannot carry extra features.")
         for i in range(len(self.layers)):
-            x = self.layers[i](x)
-            if i < len(self.layers) - 1:
+            x = self.embed(x) if i == 0 and raw else self.layers[i](x)
+            if i < len(self.layers) - 1 or self.heads is not None:
                 x = torch.relu(x)
+        if self.heads is not None:
+            return [head(x) for head in self.heads]
         return x
 
+    def embed(self, permutations):
+        """
+        Computes the first layer (before the activation) on raw permutations by gathering and summing the
+        columns of its weight for the one-hot entries at each position, as an embedding bag.
+        """
+        n = self.n
+        positions = torch.arange(0, n * n, n, device=permutations.device)
+        first = self.layers[0]
+        return (
+            F.embedding_bag(
+                permutations - 1 + positions,
+                first.weight.t().contiguous(),
+                mode="sum",
+            )
+            + first.bias
+        )
+
     def plot_heatmap_feature(
         self,
         layer,
@@ -79,7 +122,7 @@ class PermutationModel(nn.Module):
             plt.tight_layout()
             plt.show()
 
-    def plot_connections(self):
+    def plot_connections(self, top_k=None, threshold=None):
         """
         Plots the connections between features in the model.
 
@@ -89,63 +132,93 @@ class PermutationModel(nn.Module):
         color is red if the weight is positive and blue if the weight is negative.
 
         Parameters:
-            None
+            top_k (int): If given, only the `top_k` edges of largest magnitude in each layer are drawn.
+            threshold (float): If given, edges whose weight has magnitude below `threshold` are not drawn.
+        """
+        fig, ax = plt.subplots(figsize=(6, 6))
+        self.draw_connections(ax, top_k, threshold)
+        plt.show()
+
+    def draw_connections(self, ax, top_k=None, threshold=None):
+        """
+        Draws the plot of `plot_connections` onto the axes `ax`. All edges are drawn as one LineCollection and
+        all nodes as one EllipseCollection, so networks with many thousands of edges render quickly.
         """
         n = self.n
-        width = max([n**2] + [layer.weight.shape[0] for layer in self.layers])
+        width = max(
+            [n**2 + self.extra_features]
+            + [layer.weight.shape[0] for layer in self.layers]
+        )
         max_val = max(
-            [
-                max(abs(layer.weight.min()), abs(layer.weight.max()))
-                for layer in self.layers
-            ]
+            [layer.weight.detach().abs().max().item() for layer in self.layers]
         )
         xspace = 1
         yspace = width / 3
         radius = 0.1
 
-        fig, ax = plt.subplots(figsize=(6, 6))
-
         # Plot edges
-        for i in range(len(self.layers)):
-            for j in range(self.layers[i].weight.shape[0]):
-                for k in range(self.layers[i].weight.shape[1]):
-                    x = [
-                        (k - (self.layers[i].weight.shape[1] - 1) / 2) * xspace,
-                        (j - (self.layers[i].weight.shape[0] - 1) / 2) * xspace,
-                    ]
-                    y = [
-                        yspace * (i - len(self.layers) / 2),
-                        yspace * (i + 1 - len(self.layers) / 2),
-                    ]
-                    val = self.layers[i].weight[j][k].item()
-                    color = "red" if val > 0 else "blue"
-                    plt.plot(
-                        x,
-                        y,
-                        color=color,
-                        linestyle="-",
-                        linewidth=abs(val) / max_val,
-                        zorder=1,
-                    )
+        segments, values = [], []
+        for i, layer in enumerate(self.layers):
+            weight = layer.weight.detach().cpu()
+            rows, cols = weight.shape
+            j, k = torch.meshgrid(torch.arange(rows), torch.arange(cols), indexing="ij")
+            j, k, val = j.flatten(), k.flatten(), weight.flatten()
+            keep = torch.ones_like(val, dtype=torch.bool)
+            if threshold is not None:
+                keep &= val.abs() >= threshold
+            if top_k is not None and top_k < len(val):
+                keep &= val.abs() >= val.abs().topk(top_k).values[-1]
+            j, k, val = j[keep], k[keep], val[keep]
+            x0 = (k - (cols - 1) / 2) * xspace
+            x1 = (j - (rows - 1) / 2) * xspace
+            y0 = torch.full_like(x0, yspace * (i - len(self.layers) / 2))
+            y1 = torch.full_like(x1, yspace * (i + 1 - len(self.layers) / 2))
+            segments.append(torch.stack([x0, y0, x1, y1], dim=1).view(-1, 2, 2))
+            values.append(val)
+        segments = torch.cat(segments).numpy()
+        values = torch.cat(values).numpy()
+        ax.add_collection(
+            LineCollection(
+                segments,
+                colors=np.where(values[:, None] > 0, to_rgba("red"), to_rgba("blue")),
+                linewidths=np.abs(values) / max_val,
+                zorder=1,
+            ),
+            autolim=False,
+        )
 
         # Plot nodes
-        rows = [self.n**2] + [layer.weight.shape[0] for layer in self.layers]
-        for i in range(len(rows)):
-            for j in range(rows[i]):
-                circle = plt.Circle(
-                    (
-                        (j - (rows[i] - 1) / 2) * xspace,
-                        (i - (len(rows) - 1) / 2) * yspace,
-                    ),
-                    radius,
-                    color="black",
-                    zorder=2,
+        rows = [self.n**2 + self.extra_features] + [
+            layer.weight.shape[0] for layer in self.layers
+        ]
+        centers = np.concatenate(
+            [
+                np.stack(
+                    [
+                        (np.arange(row) - (row - 1) / 2) * xspace,
+                        np.full(row, (i - (len(rows) - 1) / 2) * yspace),
+                    ],
+                    axis=1,
                 )
-                ax.add_patch(circle)
+                for i, row in enumerate(rows)
+            ]
+        )
+        ax.add_collection(
+            EllipseCollection(
+                2 * radius,
+                2 * radius,
+                0,
+                units="xy",
+                offsets=centers,
+                offset_transform=ax.transData,
+                color="black",
+                zorder=2,
+            ),
+            autolim=False,
+        )
 
         lim = max(width / 2 * xspace + 2 * radius, yspace + 2 * radius)
-        plt.xlim(-lim, lim)
-        plt.ylim(-lim, lim)
-        plt.title("Model Feature Connections")
+        ax.set_xlim(-lim, lim)
+        ax.set_ylim(-lim, lim)
+        ax.set_title("Model Feature Connections")
         ax.axis("off")
-        plt.show()
@@ -0,0 +1,257 @@
+import itertools
+import numpy as np
+
+
+def _standardize(sequence):
+    """
+    Replaces the entries of a sequence of distinct numbers by 1, ..., k keeping their relative order.
+    """
+    ranks = sorted(sequence)
+    return tuple(ranks.index(x) + 1 for x in sequence)
+
+
+def _reverse(permutation):
+    return permutation[::-1]
+
+
+def _complement(permutation):
+    n = len(permutation)
+    return [n + 1 - x for x in permutation]
+
+
+def _contains_123(permutation):
+    # Keep the smallest entry so far and the smallest entry that ends an increasing pair so far.
+    first = second = float("inf")
+    for x in permutation:
+        if x <= first:
+            first = x
+        elif x <= second:
+            second = x
+        else:
+            return True
+    return False
+
+
+def _contains_231(permutation):
+    # Stack sorting: an entry popped by a larger one is the "2" and "3" of a 231, so a later entry
+    # below the largest popped entry completes one.
+    stack = []
+    popped = 0
+    for x in permutation:
+        if x < popped:
+            return True
+        while stack and stack[-1] < x:
+            popped = stack.pop()
+        stack.append(x)
+    return False
+
+
+# Each pattern of length 3 is the image of 123 or 231 under reversal and complement, which preserve
+# containment when applied to both the pattern and the permutation.
+_LENGTH_3 = {
+    (1, 2, 3): (_contains_123, ()),
+    (3, 2, 1): (_contains_123, (_complement,)),
+    (2, 3, 1): (_contains_231, ()),
+    (1, 3, 2): (_contains_231, (_reverse,)),
+    (2, 1, 3): (_contains_231, (_complement,)),
+    (3, 1, 2): (_contains_231, (_reverse, _complement)),
+}
+
+
+def _interval(pattern, i, middle):
+    """
+    Returns which of the three value ranges cut out by the middle two pattern entries holds pattern[i].
+    """
+    return sum(pattern[i] > pattern[m] for m in middle)
+
+
+def _contains_length_4(permutation, pattern):
+    """
+    Checks containment of a pattern of length 4 in O(n^2) time and memory. Every pair of positions is tried
+    for the middle two entries of the pattern, and tables of the nearest values seen before and after each
+    position decide in constant time whether a first and a last entry in the right value ranges exist.
+    """
+    n = len(permutation)
+    infinity = n + 1
+
+    def tables(order):
+        # above[t][v] / below[t][v]: the smallest value >= v / largest value <= v among the first t
+        # entries of permutation taken in the given order of positions.
+        seen = [False] * (n + 2)
+        above, below = [], []
+        for t in range(n + 1):
+            row_above = [infinity] * (n + 2)
+            row_below = [0] * (n + 2)
+            for v in range(n, 0, -1):
+                row_above[v] = v if seen[v] else row_above[v + 1]
+            for v in range(1, n + 1):
+                row_below[v] = v if seen[v] else row_below[v - 1]
+            row_below[n + 1] = row_below[n]
+            above.append(row_above)
+            below.append(row_below)
+            if t < n:
+                seen[permutation[order[t]]] = True
+        return above, below
+
+    prefix_above, prefix_below = tables(range(n))
+    suffix_above, suffix_below = tables(range(n - 1, -1, -1))
+    first = _interval(pattern, 0, (1, 2))
+    last = _interval(pattern, 3, (1, 2))
+    for j, l in itertools.combinations(range(n), 2):
+        x, y = permutation[j], permutation[l]
+        if (x < y) != (pattern[1] < pattern[2]):
+            continue
+        bounds = [0, min(x, y), max(x, y), infinity]
+        before_above, before_below = prefix_above[j], prefix_below[j]
+        after_above, after_below = suffix_above[n - 1 - l], suffix_below[n - 1 - l]
+        lo, hi = bounds[first], bounds[first + 1]
+        smallest_before, largest_before = before_above[lo + 1], before_below[hi - 1]
+        if smallest_before >= hi:
+            continue
+        lo, hi = bounds[last], bounds[last + 1]
+        smallest_after, largest_after = after_above[lo + 1], after_below[hi - 1]
+        if smallest_after >= hi:
+            continue
+        if first != last:
+            return True
+        if pattern[0] < pattern[3] and smallest_before < largest_after:
+            return True
+        if pattern[0] > pattern[3] and largest_before > smallest_after:
+            return True
+    return False
+
+
+def contains(permutation, pattern):
+    """
+    Checks whether a permutation contains a pattern, i.e. has a subsequence whose entries are in the same
+    relative order as the pattern. Patterns of length 3 take O(n) time, patterns of length 4 take O(n^2), and
+    longer patterns fall back to checking every subsequence.
+
+    Parameters:
+        permutation (Tuple[int]): A permutation of 1, ..., n.
+        pattern (Tuple[int]): A permutation of 1, ..., k.
+
+    Returns:
+        bool: True if the permutation contains the pattern, False otherwise.
+
+    Example:
+        >>> contains((1, 4, 2, 3), (1, 3, 2))
+        True
+        >>> contains((1, 4, 2, 3), (2, 3, 1))
+        False
+    """
+    permutation, pattern = list(permutation), tuple(pattern)
+    k = len(pattern)
+    if k > len(permutation):
+        return False
+    if k < 2:
+        return True
+    if k == 2:
+        return any(
+            (a < b) == (pattern == (1, 2)) for a, b in zip(permutation, permutation[1:])
+        )
+    if k == 3:
+        check, symmetries = _LENGTH_3[pattern]
+        for symmetry in symmetries:
+            permutation = symmetry(permutation)
+        return check(permutation)
+    if k == 4:
+        return _contains_length_4(permutation, pattern)
+    return any(
+        _standardize(subsequence) == pattern
+        for subsequence in itertools.combinations(permutation, k)
+    )
+
+
+def avoids(permutation, pattern):
+    """
+    Checks whether a permutation avoids a pattern, i.e. does not contain it.
+
+    Example:
+        >>> avoids((1, 4, 2, 3), (2, 3, 1))
+        True
+    """
+    return not contains(permutation, pattern)
+
+
+def _masked_extreme(permutations, mask, largest):
+    """
+    Returns the largest (or smallest) entry of each row where mask is True, or 0 (or n + 1) if there is none.
+    """
+    n = permutations.shape[1]
+    if largest:
+        return np.where(mask, permutations, 0).max(axis=1)
+    return np.where(mask, permutations, n + 1).min(axis=1)
+
+
+def contains_batch(permutations, pattern):
+    """
+    Batched form of `contains` over an array of permutations. Patterns of length 3 and 4 try every position
+    (or pair of positions) for the middle entries of the pattern, with all rows handled together by NumPy,
+    and longer patterns compare every subsequence.
+
+    Parameters:
+        permutations (np.ndarray): An integer array of shape (batch, n), one permutation of 1, ..., n per row.
+        pattern (Tuple[int]): A permutation of 1, ..., k.
+
+    Returns:
+        np.ndarray: A boolean array of shape (batch,) that is True where the permutation contains the pattern.
+
+    Example:
+        >>> contains_batch(np.array([[1, 4, 2, 3], [3, 4, 1, 2]]), (2, 3, 1)).tolist()
+        [False, True]
+    """
+    permutations = np.asarray(permutations, dtype=np.int16)
+    pattern = tuple(pattern)
+    batch, n = permutations.shape
+    k = len(pattern)
+    found = np.zeros(batch, dtype=bool)
+    if k > n:
+        return found
+    if k == 1:
+        return ~found
+    if k not in (3, 4):
+        for positions in itertools.combinations(range(n), k):
+            values = permutations[:, [positions[i] for i in np.argsort(pattern)]]
+            found |= (values[:, :-1] < values[:, 1:]).all(axis=1)
+        return found
+    middle = (1,) if k == 3 else (1, 2)
+    first = _interval(pattern, 0, middle)
+    last = _interval(pattern, k - 1, middle)
+    positions = np.arange(n)
+    for chosen in itertools.combinations(range(n), len(middle)):
+        j, l = chosen[0], chosen[-1]
+        values = permutations[:, list(chosen)]
+        ok = np.ones(batch, dtype=bool)
+        if k == 4:
+            ok = (values[:, 0] < values[:, 1]) == (pattern[1] < pattern[2])
+        bounds = [
+            np.zeros(batch, dtype=np.int16),
+            values.min(axis=1),
+            values.max(axis=1),
+        ]
+        bounds = bounds[: len(middle) + 1] + [np.full(batch, n + 1, dtype=np.int16)]
+        before = (positions < j)[None, :] & (permutations > bounds[first][:, None])
+        before &= permutations < bounds[first + 1][:, None]
+        after = (positions > l)[None, :] & (permutations > bounds[last][:, None])
+        after &= permutations < bounds[last + 1][:, None]
+        ok &= before.any(axis=1) & after.any(axis=1)
+        if first == last:
+            # The first and last entries share a value range, so their own order has to be checked too.
+            if pattern[0] < pattern[-1]:
+                ok &= _masked_extreme(permutations, before, False) < _masked_extreme(
+                    permutations, after, True
+                )
+            else:
+                ok &= _masked_extreme(permutations, before, True) > _masked_extreme(
+                    permutations, after, False
+                )
+        found |= ok
+    return found
+
+
+def avoids_batch(permutations, pattern):
+    """
+    Batched form of `avoids`.
+    """
+    return ~contains_batch(permutations, pattern)
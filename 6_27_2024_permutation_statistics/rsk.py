@@ -0,0 +1,169 @@
+import bisect
+import numpy as np
+
+
+def rsk(permutation):
+    """
+    Computes the Robinson-Schensted-Knuth correspondence of a permutation by row insertion. Each row of the
+    insertion tableau is kept sorted, so the entry to bump is found by binary search as in patience sorting.
+
+    Parameters:
+        permutation (Tuple[int]): A permutation of 1, ..., n.
+
+    Returns:
+        Tuple[Tuple[Tuple[int]], Tuple[Tuple[int]]]: The insertion tableau P and the recording tableau Q,
+        two standard Young tableaux of the same shape.
+
+    Example:
+        >>> rsk((3, 1, 2))
+        (((1, 2), (3,)), ((1, 3), (2,)))
+    """
+    P, Q = [], []
+    for k, x in enumerate(permutation, 1):
+        for row, record in zip(P, Q):
+            i = bisect.bisect_left(row, x)
+            if i == len(row):
+                row.append(x)
+                record.append(k)
+                break
+            row[i], x = x, row[i]
+        else:
+            P.append([x])
+            Q.append([k])
+    return tuple(tuple(row) for row in P), tuple(tuple(row) for row in Q)
+
+
+def inverse_rsk(P, Q):
+    """
+    Recovers the permutation whose RSK correspondence is (P, Q) by reverse bumping the entries of P
+    in the order given by Q.
+
+    Parameters:
+        P (Tuple[Tuple[int]]): The insertion tableau.
+        Q (Tuple[Tuple[int]]): The recording tableau, of the same shape as P.
+
+    Returns:
+        Tuple[int]: The permutation.
+
+    Example:
+        >>> inverse_rsk(((1, 2), (3,)), ((1, 3), (2,)))
+        (3, 1, 2)
+    """
+    if [len(row) for row in P] != [len(row) for row in Q]:
+        raise ValueError("P and Q must have the same shape.")
+    P = [list(row) for row in P]
+    cells = {k: i for i, record in enumerate(Q) for k in record}
+    n = len(cells)
+    permutation = [0] * n
+    for k in range(n, 0, -1):
+        i = cells[k]
+        x = P[i].pop()
+        for row in reversed(P[:i]):
+            j = bisect.bisect_left(row, x) - 1
+            row[j], x = x, row[j]
+        permutation[k - 1] = x
+        if not P[i]:
+            P.pop()
+    return tuple(permutation)
+
+
+def rsk_batch(permutations, chunk_size=2**16):
+    """
+    Computes the RSK correspondence of every permutation in a batch at once. Each element is inserted into
+    all tableaux of a chunk together, and only the permutations whose insertion is still bumping are carried
+    on to the next row. Row r of a tableau has at most n // (r + 1) entries, so only that many columns are
+    searched.
+
+    Parameters:
+        permutations (np.ndarray): An integer array of shape (batch, n), one permutation of 1, ..., n per row.
+        chunk_size (int): The number of permutations processed together, which bounds the temporary memory.
+
+    Returns:
+        Tuple[np.ndarray, np.ndarray]: The tableaux P and Q as uint8 arrays of shape (batch, n, n), padded
+        with zeros outside the shape.
+
+    Example:
+        >>> P, Q = rsk_batch(np.array([[3, 1, 2]]))
+        >>> P[0].tolist(), Q[0].tolist()
+        ([[1, 2, 0], [3, 0, 0], [0, 0, 0]], [[1, 3, 0], [2, 0, 0], [0, 0, 0]])
+    """
+    permutations = np.asarray(permutations)
+    batch, n = permutations.shape
+    P = np.zeros((batch, n, n), dtype=np.uint8)
+    Q = np.zeros((batch, n, n), dtype=np.uint8)
+    for start, stop, P_chunk, Q_chunk in _rsk_chunks(permutations, chunk_size):
+        P[start:stop], Q[start:stop] = P_chunk, Q_chunk
+    return P, Q
+
+
+def _rsk_chunks(permutations, chunk_size):
+    """
+    Yields (start, stop, P, Q) for each chunk of `chunk_size` permutations, so callers that only need part of
+    the tableaux never hold them for the whole batch.
+    """
+    batch, n = permutations.shape
+    if n > 254:
+        raise ValueError("rsk_batch stores entries as uint8 and supports n <= 254.")
+    for start in range(0, batch, chunk_size):
+        stop = min(start + chunk_size, batch)
+        yield start, stop, *_rsk_chunk(permutations[start:stop].astype(np.uint8), n)
+
+
+def _rsk_chunk(permutations, n):
+    empty = n + 1
+    P = np.full((len(permutations), n, n), empty, dtype=np.uint8)
+    Q = np.zeros((len(permutations), n, n), dtype=np.uint8)
+    for k in range(n):
+        indices = np.arange(len(permutations))
+        x = permutations[:, k]
+        for r in range(k + 1):
+            width = min(n // (r + 1), k + 1)
+            rows = P[indices, r, :width]
+            # The sorted row is padded with n + 1, so counting the smaller entries finds the bump position.
+            j = (rows < x[:, None]).sum(axis=1)
+            y = rows[np.arange(len(indices)), j]
+            P[indices, r, j] = x
+            done = y == empty
+            Q[indices[done], r, j[done]] = k + 1
+            indices, x = indices[~done], y[~done]
+            if not len(indices):
+                break
+    P[P == empty] = 0
+    return P, Q
+
+
+def rsk_shapes(permutations, chunk_size=2**16):
+    """
+    Returns the RSK shape of each permutation in a batch, padded with zeros to length n. By Greene's theorem
+    the first row length is the length of the longest increasing subsequence and the number of rows is the
+    length of the longest decreasing subsequence.
+
+    Example:
+        >>> rsk_shapes(np.array([[3, 1, 2], [3, 2, 1]])).tolist()
+        [[2, 1, 0], [1, 1, 1]]
+    """
+    permutations = np.asarray(permutations)
+    batch, n = permutations.shape
+    shapes = np.zeros((batch, n), dtype=np.int64)
+    for start, stop, P, _ in _rsk_chunks(permutations, chunk_size):
+        shapes[start:stop] = (P > 0).sum(axis=2)
+    return shapes
+
+
+def rsk_features(permutations, chunk_size=2**16):
+    """
+    Encodes the RSK shape of each permutation as 2n floats: the row lengths followed by the column lengths,
+    each padded with zeros to length n. These can be appended to the one-hot encoding of the permutation.
+
+    Example:
+        >>> rsk_features(np.array([[3, 1, 2]])).tolist()
+        [[2.0, 1.0, 0.0, 2.0, 1.0, 0.0]]
+    """
+    permutations = np.asarray(permutations)
+    batch, n = permutations.shape
+    features = np.zeros((batch, 2 * n), dtype=np.float32)
+    for start, stop, P, _ in _rsk_chunks(permutations, chunk_size):
+        filled = P > 0
+        features[start:stop, :n] = filled.sum(axis=2)
+        features[start:stop, n:] = filled.sum(axis=1)
+    return features
@@ -0,0 +1,234 @@
+import itertools
+import math
+import numpy as np
+import torch
+from torch.utils.data import IterableDataset, get_worker_info
+from data import permutations_to_tensor
+from patterns import contains_batch
+
+# All statistics take an integer array of shape (batch, n) holding one permutation of 1, ..., n per row and
+# return an int64 array of shape (batch,).
+
+
+def descents(permutations):
+    """
+    Counts the positions i with p(i) > p(i + 1).
+    """
+    permutations = np.asarray(permutations)
+    return (permutations[:, :-1] > permutations[:, 1:]).sum(axis=1)
+
+
+def major_index(permutations):
+    """
+    Sums the positions i (counted from 1) with p(i) > p(i + 1).
+    """
+    permutations = np.asarray(permutations)
+    is_descent = permutations[:, :-1] > permutations[:, 1:]
+    return is_descent @ np.arange(1, permutations.shape[1], dtype=np.int64)
+
+
+def peaks(permutations):
+    """
+    Counts the positions i with p(i - 1) < p(i) > p(i + 1).
+    """
+    permutations = np.asarray(permutations)
+    middle = permutations[:, 1:-1]
+    return ((permutations[:, :-2] < middle) & (middle > permutations[:, 2:])).sum(
+        axis=1
+    )
+
+
+def inversions(permutations):
+    """
+    Counts the pairs i < j with p(i) > p(j).
+    """
+    permutations = np.asarray(permutations)
+    n = permutations.shape[1]
+    total = np.zeros(len(permutations), dtype=np.int64)
+    for offset in range(1, n):
+        total += (permutations[:, :-offset] > permutations[:, offset:]).sum(axis=1)
+    return total
+
+
+def fixed_points(permutations):
+    """
+    Counts the positions i with p(i) = i.
+    """
+    permutations = np.asarray(permutations)
+    return (permutations == np.arange(1, permutations.shape[1] + 1)).sum(axis=1)
+
+
+def excedances(permutations):
+    """
+    Counts the positions i with p(i) > i.
+    """
+    permutations = np.asarray(permutations)
+    return (permutations > np.arange(1, permutations.shape[1] + 1)).sum(axis=1)
+
+
+def cycles(permutations):
+    """
+    Counts the cycles of each permutation, including fixed points.
+    """
+    permutations = np.asarray(permutations, dtype=np.int64) - 1
+    n = permutations.shape[1]
+    # After n - 1 steps, smallest[:, i] is the smallest element of the cycle of i, and each cycle is
+    # counted at its smallest element.
+    smallest = np.broadcast_to(np.arange(n), permutations.shape).copy()
+    current = permutations.copy()
+    for _ in range(n - 1):
+        np.minimum(smallest, current, out=smallest)
+        current = np.take_along_axis(permutations, current, axis=1)
+    return (smallest == np.arange(n)).sum(axis=1)
+
+
+def longest_increasing_subsequence(permutations):
+    """
+    Returns the length of the longest increasing subsequence, found by patience sorting: each element goes
+    on the leftmost pile whose top is larger, and the number of piles is the answer.
+    """
+    permutations = np.asarray(permutations)
+    batch, n = permutations.shape
+    tops = np.full((batch, n), n + 1, dtype=np.int64)
+    rows = np.arange(batch)
+    for k in range(n):
+        x = permutations[:, k]
+        tops[rows, (tops[:, : k + 1] < x[:, None]).sum(axis=1)] = x
+    return (tops <= n).sum(axis=1)
+
+
+def longest_decreasing_subsequence(permutations):
+    """
+    Returns the length of the longest decreasing subsequence.
+    """
+    permutations = np.asarray(permutations)
+    return longest_increasing_subsequence(permutations.shape[1] + 1 - permutations)
+
+
+def pattern_occurrences(permutations, pattern):
+    """
+    Counts the occurrences of a pattern, i.e. the subsequences of each permutation whose entries are in the
+    same relative order as the pattern.
+
+    Parameters:
+        permutations (np.ndarray): An integer array of shape (batch, n).
+        pattern (Tuple[int]): A permutation of 1, ..., k.
+
+    Returns:
+        np.ndarray: The number of occurrences in each permutation.
+
+    Example:
+        >>> pattern_occurrences(np.array([[1, 3, 2, 4]]), (1, 2, 3)).tolist()
+        [2]
+    """
+    permutations = np.asarray(permutations)
+    order = np.argsort(pattern)
+    total = np.zeros(len(permutations), dtype=np.int64)
+    for positions in itertools.combinations(range(permutations.shape[1]), len(pattern)):
+        # An occurrence reads increasingly when visited in the order of the pattern's values.
+        values = permutations[:, [positions[i] for i in order]]
+        total += (values[:, :-1] < values[:, 1:]).all(axis=1)
+    return total
+
+
+# Maps each statistic to its function and to its largest value on permutations of length n, so that the
+# number of classes is known without looking at any data.
+STATISTICS = {
+    "descents": (descents, lambda n: max(n - 1, 0)),
+    "major_index": (major_index, lambda n: n * (n - 1) // 2),
+    "peaks": (peaks, lambda n: max((n - 1) // 2, 0)),
+    "inversions": (inversions, lambda n: n * (n - 1) // 2),
+    "fixed_points": (fixed_points, lambda n: n),
+    "excedances": (excedances, lambda n: max(n - 1, 0)),
+    "cycles": (cycles, lambda n: n),
+    "longest_increasing_subsequence": (longest_increasing_subsequence, lambda n: n),
+    "longest_decreasing_subsequence": (longest_decreasing_subsequence, lambda n: n),
+}
+
+
+def statistic(name, permutations):
+    """
+    Computes the statistic `name` from `STATISTICS` for a batch of permutations. A name of the form
+    "occurrences_132" counts occurrences of the pattern 132 instead, and "contains_132" is 1 if there is one.
+    """
+    if name.startswith("contains_"):
+        return contains_batch(permutations, tuple(int(c) for c in name[9:])).astype(
+            np.int64
+        )
+    if name.startswith("occurrences_"):
+        return pattern_occurrences(permutations, tuple(int(c) for c in name[12:]))
+    return STATISTICS[name][0](permutations)
+
+
+def num_classes(name, n):
+    """
+    Returns the number of values the statistic `name` takes on permutations of length `n`.
+    """
+    if name.startswith("contains_"):
+        return 2
+    if name.startswith("occurrences_"):
+        return math.comb(n, len(name) - 12) + 1
+    return STATISTICS[name][1](n) + 1
+
+
+def random_permutations(n, size, rng=None):
+    """
+    Returns `size` uniformly random permutations of 1, ..., n as a uint8 array of shape (size, n).
+    """
+    rng = np.random.default_rng() if rng is None else rng
+    return (rng.random((size, n)).argsort(axis=1) + 1).astype(np.uint8)
+
+
+class RandomPermutationDataset(IterableDataset):
+    def __init__(self, n, label_name, batch_size=64, num_batches=None, seed=None):
+        """
+        Streams batches of uniformly random permutations of length `n`, one-hot encoded like
+        `PermutationDataset`, with the statistic `label_name` computed on the fly. Nothing is stored, so any
+        n works. Use it with `DataLoader(dataset, batch_size=None)`; each worker draws from its own stream.
+
+        Parameters:
+            n (int): The length of the permutations.
+            label_name (str): A statistic accepted by `statistic`.
+            batch_size (int): The number of permutations in each batch.
+            num_batches (int): The number of batches each worker yields per pass, or None to stream forever.
+            seed (int): The seed of the random stream, or None for fresh randomness.
+        """
+        self.n = n
+        self.label_name = label_name
+        self.batch_size = batch_size
+        self.num_batches = num_batches
+        self.seed = seed
+
+    def batch(self, size, rng=None):
+        """
+        Returns one batch of `size` encoded permutations and their labels.
+        """
+        permutations = random_permutations(self.n, size, rng)
+        labels = torch.from_numpy(
+            statistic(self.label_name, permutations).astype(np.int64)
+        )
+        return permutations_to_tensor(permutations), labels
+
+    def class_weights(self, num_samples=2**16):
+        """
+        Estimates the inverse class frequencies from `num_samples` random permutations. Classes that are not
+        seen are treated as seen once.
+        """
+        _, labels = self.batch(num_samples, np.random.default_rng(self.seed))
+        counts = torch.bincount(labels, minlength=num_classes(self.label_name, self.n))
+        return 1 / counts.clamp(min=1).float()
+
+    def __iter__(self):
+        worker = get_worker_info()
+        # Workers given the same seed would repeat each other's batches, so each one mixes in its id.
+        if self.seed is not None and worker is not None:
+            rng = np.random.default_rng([self.seed, worker.id])
+        else:
+            rng = np.random.default_rng(self.seed)
+        batches = (
+            range(self.num_batches)
+            if self.num_batches is not None
+            else itertools.count()
+        )
+        for _ in batches:
+            yield self.batch(self.batch_size, rng)
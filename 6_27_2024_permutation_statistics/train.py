@@ -1,5 +1,6 @@
 import torch
 import matplotlib.pyplot as plt
+from data import batch_loader
 
 
 def train_one_epoch(training_loader, model, loss_fn, optimizer):
@@ -9,7 +10,8 @@ def train_one_epoch(training_loader, model, loss_fn, optimizer):
     Args:
         training_loader (torch.utils.data.DataLoader): The data loader for the training data.
         model (torch.nn.Module): The model to be trained.
-        loss_fn (torch.nn.loss._Loss): The loss function used to compute the loss.
+        loss_fn (torch.nn.loss._Loss): The loss function used to compute the loss. For a multi-head model this
+            can be a list with one loss function per head, and the losses of all heads are summed.
         optimizer (torch.optim.Optimizer): The optimizer used to update the model parameters.
 
     Returns:
@@ -21,7 +23,16 @@ def train_one_epoch(training_loader, model, loss_fn, optimizer):
         inputs, labels = data
         optimizer.zero_grad()
         outputs = model(inputs)
-        loss = loss_fn(outputs, labels)
+        if isinstance(outputs, list):
+            loss_fns = (
+                loss_fn if isinstance(loss_fn, list) else [loss_fn] * len(outputs)
+            )
+            loss = sum(
+                fn(output, labels[:, i])
+                for i, (fn, output) in enumerate(zip(loss_fns, outputs))
+            )
+        else:
+            loss = loss_fn(outputs, labels)
         loss.backward()
         optimizer.step()
         total_loss += loss.item()
@@ -29,63 +40,113 @@ def train_one_epoch(training_loader, model, loss_fn, optimizer):
     return total_loss
 
 
-def evaluate_model(model, test_dataset):
+def evaluate_model(model, test_dataset, batch_size=4096):
     """
     Evaluates the model using the provided test dataset and returns the confusion matrix.
 
     Args:
         model (torch.nn.Module): The model to be evaluated.
         test_dataset (torch.utils.data.Dataset): The dataset used for evaluation.
+        batch_size (int): The number of permutations run through the model at once.
 
     Returns:
         ConfusionMatrix: A k by k confusion matrix where rows represent true labels and columns represent predicted labels.
+        A multi-head model gives a list with one confusion matrix per head.
     """
     model.eval()
-    num_classes = model.layers[-1].weight.shape[0]
+    if model.heads is not None:
+        output_layers = list(model.heads)
+    else:
+        output_layers = [model.layers[-1]]
 
     with torch.no_grad():
-        confusion_matrix = [[0 for _ in range(num_classes)] for _ in range(num_classes)]
-        for data in test_dataset:
-            input, label = data
-            output = model(input)
-            confusion_matrix[label][torch.argmax(output)] += 1
-        return ConfusionMatrix(confusion_matrix)
+        confusion_matrices = [
+            ConfusionMatrix.zeros(layer.weight.shape[0]) for layer in output_layers
+        ]
+        for data in batch_loader(test_dataset, batch_size):
+            inputs, labels = data
+            outputs = model(inputs)
+            if model.heads is None:
+                outputs, labels = [outputs], labels[:, None]
+            for i, output in enumerate(outputs):
+                confusion_matrices[i].update(labels[:, i], torch.argmax(output, dim=1))
+        if model.heads is None:
+            return confusion_matrices[0]
+        return confusion_matrices
 
 
 class ConfusionMatrix:
     def __init__(self, confusion_matrix):
-        self.confusion_matrix = confusion_matrix
+        """
+        Wraps a k by k confusion matrix, given as a nested list or a tensor, where rows represent true labels
+        and columns represent predicted labels. It is stored as an int64 tensor.
+        """
+        self.confusion_matrix = torch.as_tensor(confusion_matrix, dtype=torch.int64)
+
+    @classmethod
+    def zeros(cls, num_classes):
+        return cls(torch.zeros((num_classes, num_classes), dtype=torch.int64))
 
     def __str__(self):
-        return str(self.confusion_matrix)
+        return str(self.confusion_matrix.tolist())
+
+    def update(self, labels, predictions):
+        """
+        Adds a batch of true labels and predictions to the counts with a single bincount.
+        """
+        k = len(self.confusion_matrix)
+        self.confusion_matrix += torch.bincount(
+            labels.flatten() * k + predictions.flatten(), minlength=k * k
+        ).view(k, k)
+
+    def accuracy(self):
+        """
+        Returns the fraction of all predictions that are correct.
+        """
+        return self.confusion_matrix.trace().item() / self.confusion_matrix.sum().item()
+
+    def precision(self):
+        """
+        Returns a tensor with the fraction of predictions of each class that are correct (nan if the class is
+        never predicted).
+        """
+        confusion_matrix = self.confusion_matrix.double()
+        return confusion_matrix.diag() / confusion_matrix.sum(dim=0)
+
+    def recall(self):
+        """
+        Returns a tensor with the fraction of items of each class that are predicted correctly (nan if the
+        class never occurs).
+        """
+        confusion_matrix = self.confusion_matrix.double()
+        return confusion_matrix.diag() / confusion_matrix.sum(dim=1)
 
     def print_accuracy(self):
         """
         Prints out the accuracy within each of the prediction classes and the overall accuracy.
         """
-        confusion_matrix = self.confusion_matrix
-        num_classes = len(confusion_matrix)
-        for i in range(num_classes):
-            print(
-                f"Accuracy for class {i} = {100 * confusion_matrix[i][i] / sum(confusion_matrix[i])}%"
-            )
-
-        total_correct = sum([confusion_matrix[i][i] for i in range(num_classes)])
-        total = sum([sum(confusion_matrix[i]) for i in range(num_classes)])
-        print(f"Overall accuracy = {100 * total_correct / total}%")
+        for i, recall in enumerate(self.recall().tolist()):
+            print(f"Accuracy for class {i} = {100 * recall}%")
+        print(f"Overall accuracy = {100 * self.accuracy()}%")
 
     def plot(self, title="Confusion Matrix"):
         """
         Plots the confusion matrix as a heatmap.
         """
-        confusion_matrix = self.confusion_matrix
-        plt.imshow(confusion_matrix, cmap="Blues")
-        plt.xticks(range(len(confusion_matrix)), range(len(confusion_matrix)))
-        plt.yticks(range(len(confusion_matrix)), range(len(confusion_matrix)))
-        plt.xlabel("Predicted label")
-        plt.ylabel("True label")
+        self.draw(plt.gca(), title)
+        plt.show()
+
+    def draw(self, ax, title="Confusion Matrix"):
+        """
+        Draws the heatmap of `plot` onto the axes `ax`.
+        """
+        confusion_matrix = self.confusion_matrix.tolist()
+        ax.imshow(confusion_matrix, cmap="Blues")
+        ax.set_xticks(range(len(confusion_matrix)), range(len(confusion_matrix)))
+        ax.set_yticks(range(len(confusion_matrix)), range(len(confusion_matrix)))
+        ax.set_xlabel("Predicted label")
+        ax.set_ylabel("True label")
         for i in range(len(confusion_matrix)):
             for j in range(len(confusion_matrix)):
-                plt.text(j, i, confusion_matrix[i][j], ha="center", va="center")
-        plt.title(title)
-        plt.show()
+                ax.text(j, i, confusion_matrix[i][j], ha="center", va="center")
+        ax.set_title(title)
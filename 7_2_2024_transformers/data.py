@@ -1,27 +1,42 @@
 import csv
+import numpy as np
 import torch
-from torch.utils.data import Dataset
+from torch.utils.data import (
+    BatchSampler,
+    DataLoader,
+    Dataset,
+    RandomSampler,
+    Sampler,
+    SequentialSampler,
+    Subset,
+)
 from torch import nn
+from parenthesizations import pack_rows, unpack_rows
 
 CLS_TOKEN = 2  # Classification token
 PAD_TOKEN = 3  # Padding token
 MAX_LEN = 32
 
 
-def parenthesization_to_tensor(parenthesization):
+def parenthesization_to_tensor(parenthesization, max_len=MAX_LEN):
     """
     Converts a given parenthesization string into a tensor representation.
 
     Args:
         parenthesization (str): The parenthesization string to be converted.
+        max_len (int): The length of the result, which must be more than the length of the parenthesization.
 
     Returns:
-        torch.Tensor: The tensor representation of the parenthesization. The tensor has shape (MAX_LEN,) and contains
+        torch.Tensor: The tensor representation of the parenthesization. The tensor has shape (max_len,) and contains
         integers representing the corresponding parenthesization character. The CLS_TOKEN is added at the beginning
         of the tensor, followed by the binary representation of the parenthesization string. The PAD_TOKEN is added
-        at the end of the tensor to pad the tensor to a length of MAX_LEN.
+        at the end of the tensor to pad the tensor to a length of max_len.
     """
-    pad_length = MAX_LEN - len(parenthesization) - 1
+    pad_length = max_len - len(parenthesization) - 1
+    if pad_length < 0:
+        raise ValueError(
+            f"A parenthesization of length {len(parenthesization)} does not fit in max_len={max_len}."
+        )
     return torch.tensor(
         [CLS_TOKEN]
         + [0 if c == "(" else 1 for c in parenthesization]
@@ -29,9 +44,32 @@ def parenthesization_to_tensor(parenthesization):
     )
 
 
+def packed_to_tensor(codes, lengths, max_len=MAX_LEN):
+    """
+    Converts packed parenthesizations into a batch of model inputs in one vectorized step.
+
+    Args:
+        codes (np.ndarray): The packed parenthesizations made by `parenthesizations.pack_rows` or
+            `parenthesizations.pack`.
+        lengths (np.ndarray): The lengths of the parenthesizations.
+        max_len (int): The length of each row of the result.
+
+    Returns:
+        torch.Tensor: A tensor of shape (batch, max_len) where each row matches `parenthesization_to_tensor`
+        of the corresponding parenthesization.
+    """
+    lengths = np.asarray(lengths)
+    tokens = np.empty((len(lengths), max_len), dtype=np.int64)
+    tokens[:, 0] = CLS_TOKEN
+    tokens[:, 1:] = unpack_rows(codes, max_len - 1)
+    tokens[:, 1:][np.arange(max_len - 1) >= lengths[:, None]] = PAD_TOKEN
+    return torch.from_numpy(tokens)
+
+
 def padding_mask(src):
     """
     Returns a boolean mask indicating which elements in the input tensor `src` are equal to the `PAD_TOKEN`.
+    This works for batches of any width, including those trimmed by `collate_to_longest`.
 
     Parameters:
         src (torch.Tensor): The input tensor of shape (batch_size, seq_len).
@@ -43,21 +81,168 @@ def padding_mask(src):
 
 
 class ParenthesizationDataset(Dataset):
-    def __init__(self, type="training"):
-        self.data = []
+    def __init__(self, type="training", max_len=MAX_LEN):
+        """
+        Loads the parenthesizations in `data/{type}.csv` with their validity as labels.
+
+        Args:
+            type (str): The name of the data file.
+            max_len (int): The length of each input, i.e. one more than the longest parenthesization that fits,
+                or None to fit the longest parenthesization in the file.
+        """
+        parenthesizations = []
+        labels = []
         filename = f"data/{type}.csv"
         with open(filename, "r") as file:
             csv_reader = csv.DictReader(file)
             for row in csv_reader:
-                self.data.append(
-                    (
-                        parenthesization_to_tensor(row["parenthesization"]),
-                        int(row["valid"]),
-                    )
-                )
+                parenthesizations.append(row["parenthesization"])
+                labels.append(int(row["valid"]))
+        self.codes, self.lengths = pack_rows(parenthesizations)
+        self.labels = torch.tensor(labels)
+        longest = int(self.lengths.max(initial=0))
+        self.max_len = longest + 1 if max_len is None else max_len
+        if longest >= self.max_len:
+            raise ValueError(
+                f"{filename} has parenthesizations of length {longest}, which need max_len > {longest}."
+            )
 
     def __len__(self):
-        return len(self.data)
+        return len(self.labels)
 
     def __getitem__(self, idx):
-        return self.data[idx]
+        """
+        Returns the input tensor and the label at `idx`. A list or array of indices returns a whole batch,
+        encoded with a single call to `packed_to_tensor`.
+        """
+        if isinstance(idx, (int, np.integer)):
+            inputs, labels = self[[idx]]
+            return inputs[0], labels[0]
+        idx = np.asarray(idx)
+        inputs = packed_to_tensor(self.codes[idx], self.lengths[idx], self.max_len)
+        return inputs, self.labels[idx]
+
+
+def batch_loader(dataset, batch_size, shuffle=False, drop_last=False):
+    """
+    Returns a DataLoader that passes whole lists of indices to the dataset, so that each batch is encoded with
+    one vectorized call instead of being built from and collated out of per-item tensors. Works with any
+    dataset (or `Subset` of one) whose `__getitem__` accepts a list of indices.
+
+    Args:
+        dataset (torch.utils.data.Dataset): The dataset to load from.
+        batch_size (int): The number of items in each batch.
+        shuffle (bool): Whether to visit the items in a random order each epoch.
+        drop_last (bool): Whether to drop the last batch if it is smaller than `batch_size`.
+
+    Returns:
+        torch.utils.data.DataLoader: A data loader yielding (inputs, labels) batches.
+    """
+    sampler = RandomSampler(dataset) if shuffle else SequentialSampler(dataset)
+    return DataLoader(
+        dataset,
+        sampler=BatchSampler(sampler, batch_size, drop_last),
+        batch_size=None,
+    )
+
+
+def collate_to_longest(batch):
+    """
+    Pads a batch only to its longest sequence. Accepts either a list of (input, label) items or an already
+    stacked (inputs, labels) pair, such as the batches of `batch_loader`, and drops the trailing columns that
+    are PAD_TOKEN in every row.
+
+    Args:
+        batch: The items or the stacked batch.
+
+    Returns:
+        Tuple[torch.Tensor, torch.Tensor]: The inputs of shape (batch_size, 1 + longest length) and the labels.
+    """
+    if isinstance(batch, list):
+        inputs = torch.stack([input for input, _ in batch])
+        labels = torch.stack([torch.as_tensor(label) for _, label in batch])
+    else:
+        inputs, labels = batch
+    used = (inputs != PAD_TOKEN).any(dim=0)
+    width = int(used.nonzero().max()) + 1 if used.any() else 0
+    return inputs[:, :width], labels
+
+
+class BucketBatchSampler(Sampler):
+    def __init__(
+        self, lengths, batch_size, shuffle=False, drop_last=False, generator=None
+    ):
+        """
+        Yields batches of indices whose sequences have similar lengths, so that `collate_to_longest` can trim
+        most of the padding. Indices are sorted by length (in a random order within each length when shuffling)
+        and cut into batches, and the order of the batches is shuffled.
+
+        Args:
+            lengths (np.ndarray): The length of each sequence.
+            batch_size (int): The number of items in each batch.
+            shuffle (bool): Whether to randomize the batches each epoch.
+            drop_last (bool): Whether to drop the last batch if it is smaller than `batch_size`.
+            generator (torch.Generator): The generator to shuffle with. As in `RandomSampler`, a new one seeded
+                from torch's global generator is used each epoch if None, so `torch.manual_seed` makes runs
+                reproducible.
+        """
+        self.lengths = np.asarray(lengths)
+        self.batch_size = batch_size
+        self.shuffle = shuffle
+        self.drop_last = drop_last
+        self.generator = generator
+
+    def __len__(self):
+        if self.drop_last:
+            return len(self.lengths) // self.batch_size
+        return -(-len(self.lengths) // self.batch_size)
+
+    def __iter__(self):
+        if self.shuffle:
+            generator = self.generator
+            if generator is None:
+                seed = int(torch.empty((), dtype=torch.int64).random_().item())
+                generator = torch.Generator()
+                generator.manual_seed(seed)
+            order = torch.randperm(len(self.lengths), generator=generator).numpy()
+            order = order[np.argsort(self.lengths[order], kind="stable")]
+        else:
+            order = np.argsort(self.lengths, kind="stable")
+        batches = [
+            order[start : start + self.batch_size].tolist()
+            for start in range(0, len(order), self.batch_size)
+        ]
+        if self.drop_last and batches and len(batches[-1]) < self.batch_size:
+            batches.pop()
+        if self.shuffle:
+            permutation = torch.randperm(len(batches), generator=generator).tolist()
+            batches = [batches[i] for i in permutation]
+        return iter(batches)
+
+
+def bucket_loader(dataset, batch_size, shuffle=False, drop_last=False, generator=None):
+    """
+    Returns a DataLoader like `batch_loader` whose batches group sequences of similar length and are padded
+    only to their longest sequence, so less attention is spent on PAD_TOKEN. The batches can be passed to
+    `train_one_epoch`, `compute_validation_loss` and `evaluate_model` as usual.
+
+    Args:
+        dataset (ParenthesizationDataset): The dataset to load from, or a `Subset` of one.
+        batch_size (int): The number of items in each batch.
+        shuffle (bool): Whether to randomize the batches each epoch.
+        drop_last (bool): Whether to drop the last batch if it is smaller than `batch_size`.
+        generator (torch.Generator): The generator to shuffle with, as in `BucketBatchSampler`.
+
+    Returns:
+        torch.utils.data.DataLoader: A data loader yielding (inputs, labels) batches of varying width.
+    """
+    if isinstance(dataset, Subset):
+        lengths = dataset.dataset.lengths[np.asarray(dataset.indices)]
+    else:
+        lengths = dataset.lengths
+    return DataLoader(
+        dataset,
+        sampler=BucketBatchSampler(lengths, batch_size, shuffle, drop_last, generator),
+        batch_size=None,
+        collate_fn=collate_to_longest,
+    )
@@ -5,41 +5,79 @@ from data import PAD_TOKEN, padding_mask, parenthesization_to_tensor
 
 class ConfusionMatrix:
     def __init__(self, confusion_matrix):
-        self.confusion_matrix = confusion_matrix
+        """
+        Wraps a k by k confusion matrix, given as a nested list or a tensor, where rows represent true labels
+        and columns represent predicted labels. It is stored as an int64 tensor.
+        """
+        self.confusion_matrix = torch.as_tensor(confusion_matrix, dtype=torch.int64)
+
+    @classmethod
+    def zeros(cls, num_classes):
+        return cls(torch.zeros((num_classes, num_classes), dtype=torch.int64))
 
     def __str__(self):
-        return str(self.confusion_matrix)
+        return str(self.confusion_matrix.tolist())
+
+    def update(self, labels, predictions):
+        """
+        Adds a batch of true labels and predictions to the counts with a single bincount.
+        """
+        k = len(self.confusion_matrix)
+        self.confusion_matrix += torch.bincount(
+            labels.flatten() * k + predictions.flatten(), minlength=k * k
+        ).view(k, k)
+
+    def accuracy(self):
+        """
+        Returns the fraction of all predictions that are correct.
+        """
+        return self.confusion_matrix.trace().item() / self.confusion_matrix.sum().item()
+
+    def precision(self):
+        """
+        Returns a tensor with the fraction of predictions of each class that are correct (nan if the class is
+        never predicted).
+        """
+        confusion_matrix = self.confusion_matrix.double()
+        return confusion_matrix.diag() / confusion_matrix.sum(dim=0)
+
+    def recall(self):
+        """
+        Returns a tensor with the fraction of items of each class that are predicted correctly (nan if the
+        class never occurs).
+        """
+        confusion_matrix = self.confusion_matrix.double()
+        return confusion_matrix.diag() / confusion_matrix.sum(dim=1)
 
     def print_accuracy(self):
         """
         Prints out the accuracy within each of the prediction classes and the overall accuracy.
         """
-        confusion_matrix = self.confusion_matrix
-        num_classes = len(confusion_matrix)
-        for i in range(num_classes):
-            print(
-                f"Accuracy for class {i} = {100 * confusion_matrix[i][i] / sum(confusion_matrix[i])}%"
-            )
-
-        total_correct = sum([confusion_matrix[i][i] for i in range(num_classes)])
-        total = sum([sum(confusion_matrix[i]) for i in range(num_classes)])
-        print(f"Overall accuracy = {100 * total_correct / total}%")
+        for i, recall in enumerate(self.recall().tolist()):
+            print(f"Accuracy for class {i} = {100 * recall}%")
+        print(f"Overall accuracy = {100 * self.accuracy()}%")
 
     def plot(self, title="Confusion Matrix"):
         """
         Plots the confusion matrix as a heatmap.
         """
-        confusion_matrix = self.confusion_matrix
-        plt.imshow(confusion_matrix, cmap="Blues")
-        plt.xticks(range(len(confusion_matrix)), range(len(confusion_matrix)))
-        plt.yticks(range(len(confusion_matrix)), range(len(confusion_matrix)))
-        plt.xlabel("Predicted label")
-        plt.ylabel("True label")
+        self.draw(plt.gca(), title)
+        plt.show()
+
+    def draw(self, ax, title="Confusion Matrix"):
+        """
+        Draws the heatmap of `plot` onto the axes `ax`.
+        """
+        confusion_matrix = self.confusion_matrix.tolist()
+        ax.imshow(confusion_matrix, cmap="Blues")
+        ax.set_xticks(range(len(confusion_matrix)), range(len(confusion_matrix)))
+        ax.set_yticks(range(len(confusion_matrix)), range(len(confusion_matrix)))
+        ax.set_xlabel("Predicted label")
+        ax.set_ylabel("True label")
         for i in range(len(confusion_matrix)):
             for j in range(len(confusion_matrix)):
-                plt.text(j, i, confusion_matrix[i][j], ha="center", va="center")
-        plt.title(title)
-        plt.show()
+                ax.text(j, i, confusion_matrix[i][j], ha="center", va="center")
+        ax.set_title(title)
 
 
 def evaluate_model(model, dataloader):
@@ -57,14 +95,13 @@ def evaluate_model(model, dataloader):
     model.eval()
 
     with torch.no_grad():
-        confusion_matrix = [[0, 0], [0, 0]]
+        confusion_matrix = ConfusionMatrix.zeros(2)
         for data in dataloader:
             inputs, labels = data
             output = model(inputs, mask=padding_mask(inputs))
             predictions = torch.argmax(torch.select(output, 1, 0), dim=1)
-            for label, prediction in zip(labels, predictions):
-                confusion_matrix[label][prediction] += 1
-        return ConfusionMatrix(confusion_matrix)
+            confusion_matrix.update(labels, predictions)
+        return confusion_matrix
 
 
 def predict(model, single_input):
@@ -0,0 +1,123 @@
+from matplotlib.figure import Figure
+from matplotlib.backends.backend_pdf import PdfPages
+from interpret import draw_linear_layer
+
+# Figures are created directly rather than through pyplot, so nothing here needs a display and saving
+# always goes through the Agg (PNG) or PDF canvas.
+
+
+class Exporter:
+    def __init__(self, columns=8, tile_size=(2.0, 2.0), dpi=100):
+        """
+        Renders many small plots into tiled pages and saves them without a display. The same Figure is cleared
+        and reused for every page and every call.
+
+        Parameters:
+            columns (int): The number of tiles in each row of a page.
+            tile_size (Tuple[float, float]): The width and height of each tile in inches.
+            dpi (int): The resolution of raster outputs.
+        """
+        self.columns = columns
+        self.tile_size = tile_size
+        self.dpi = dpi
+        self.figure = Figure()
+
+    def page(self, tiles, title=None):
+        """
+        Draws the tiles onto the reused figure in a grid and returns it.
+
+        Parameters:
+            tiles (List[Callable[[Axes], None]]): Functions that each draw one plot onto the axes they are given.
+            title (str): The title of the page.
+
+        Returns:
+            matplotlib.figure.Figure: The figure holding the page.
+        """
+        figure = self.figure
+        figure.clear()
+        columns = max(min(self.columns, len(tiles)), 1)
+        rows = max(-(-len(tiles) // columns), 1)
+        figure.set_size_inches(columns * self.tile_size[0], rows * self.tile_size[1])
+        axes = figure.subplots(rows, columns, squeeze=False)
+        for ax, tile in zip(axes.flat, tiles):
+            tile(ax)
+        for ax in axes.flat[len(tiles) :]:
+            ax.axis("off")
+        if title is not None:
+            figure.suptitle(title)
+        figure.tight_layout()
+        return figure
+
+    def save(self, pages, path):
+        """
+        Saves pages of tiles to `path`. A PDF gets one page per entry of `pages`; any other format (e.g. PNG)
+        gets a single image with all tiles.
+
+        Parameters:
+            pages (List[Tuple[str, List[Callable[[Axes], None]]]]): The title and tiles of each page.
+            path (str): The output file.
+        """
+        if str(path).lower().endswith(".pdf"):
+            with PdfPages(path) as pdf:
+                for title, tiles in pages:
+                    pdf.savefig(self.page(tiles, title))
+        else:
+            tiles = [tile for _, tiles in pages for tile in tiles]
+            self.page(tiles).savefig(path, dpi=self.dpi)
+
+
+_exporter = None
+
+
+def default_exporter():
+    """
+    Returns the shared Exporter used when none is passed, creating it on first use.
+    """
+    global _exporter
+    if _exporter is None:
+        _exporter = Exporter(columns=4, tile_size=(4.0, 3.0))
+    return _exporter
+
+
+def export_linear_layers(layers, path, titles=None, exporter=None):
+    """
+    Saves the heatmaps of linear layers, as `interpret.plot_linear_layer` draws them, to a tiled image or (for a
+    .pdf path) a file with one page per layer.
+
+    Parameters:
+        layers (List[nn.Linear]): The layers to draw, e.g. `[model.proj, model.encoder.layers[0].linear2]`.
+        path (str): The output file.
+        titles (List[str]): The title of each layer.
+        exporter (Exporter): The exporter to render with, defaulting to `default_exporter()`.
+    """
+    if titles is None:
+        titles = [f"Linear layer {i}" for i in range(len(layers))]
+    pages = [
+        (
+            title,
+            [lambda ax, layer=layer, title=title: draw_linear_layer(ax, layer, title)],
+        )
+        for layer, title in zip(layers, titles)
+    ]
+    (exporter or default_exporter()).save(pages, path)
+
+
+def export_confusion_matrices(confusion_matrices, path, titles=None, exporter=None):
+    """
+    Saves confusion matrices, as `ConfusionMatrix.plot` draws them, to a tiled image or (for a .pdf path) a
+    file with one page per matrix.
+
+    Parameters:
+        confusion_matrices (List[ConfusionMatrix]): The confusion matrices, e.g. for the training, validation
+            and test data.
+        path (str): The output file.
+        titles (List[str]): The title of each matrix.
+        exporter (Exporter): The exporter to render with, defaulting to `default_exporter()`.
+    """
+    if titles is None:
+        titles = [f"Confusion Matrix {i}" for i in range(len(confusion_matrices))]
+    pages = [
+        (title, [lambda ax, matrix=matrix, title=title: matrix.draw(ax, title)])
+        for matrix, title in zip(confusion_matrices, titles)
+    ]
+    (exporter or default_exporter()).save(pages, path)
@@ -1,7 +1,10 @@
+import glob
+import os
 import matplotlib.pyplot as plt
+import numpy as np
 import torch
 
-from data import PAD_TOKEN, padding_mask
+from data import PAD_TOKEN, packed_to_tensor, padding_mask
 
 
 def plot_linear_layer(
@@ -13,30 +16,173 @@ def plot_linear_layer(
     Parameters:
         layer (nn.Linear): The Linear layer for which the weights are to be visualized.
     """
-    # TODO
-    return
+    fig, ax = plt.subplots()
+    draw_linear_layer(ax, layer)
+    plt.show()
 
 
-def incorrect_predictions(model, dataloader):
+def draw_linear_layer(ax, layer, title="Linear layer weights"):
+    """
+    Draws the heatmap of `plot_linear_layer` onto the axes `ax`, with rows for outputs and columns for inputs.
+    """
+    weights = layer.weight.detach().cpu()
+    max_val = weights.abs().max().item()
+    image = ax.imshow(
+        weights.numpy(), cmap="bwr", vmin=-max_val, vmax=max_val, aspect="auto"
+    )
+    ax.figure.colorbar(image, ax=ax)
+    ax.locator_params(integer=True)
+    ax.set_xlabel("Input feature")
+    ax.set_ylabel("Output feature")
+    ax.set_title(title)
+
+
+def incorrect_predictions(model, dataloader, path=None, shard_size=2**16):
     """
     Given a model and a dataloader, this function evaluates the model by predicting the labels for each input in the dataloader.
     It keeps track of incorrect predictions and returns a list of inputs that were incorrectly predicted for each label.
 
+    For large datasets, pass a directory as `path` to stream the incorrect predictions to disk instead. Each batch
+    is checked at once, and the failures are written as `.npy` shards of at most `shard_size` rows (replacing the
+    shards of an earlier run), so memory use does not grow with the dataset. Each row holds the packed
+    parenthesization (as in `ParenthesizationDataset`), its true label and the model's logits, and
+    `load_incorrect_predictions` reads the shards back.
+
     Args:
         model (torch.nn.Module): The model used for prediction.
         dataloader (torch.utils.data.DataLoader): The dataloader containing the input data.
+        path (str): The directory to write the shards to, or None to return the incorrect predictions.
+        shard_size (int): The number of incorrect predictions in each shard.
 
     Returns:
         List[List[List[int]]]: A list of incorrect predictions for each label. The list contains two sublists, one for each label.
             Each sublist contains a list of inputs that were incorrectly predicted for that label.
             Each input is represented as a list of integers.
+            If `path` is given, the list of shard files is returned instead.
     """
     model.eval()
 
     with torch.no_grad():
         incorrect_predictions = [[], []]
-        # TODO
-        return incorrect_predictions
+        if path is not None:
+            os.makedirs(path, exist_ok=True)
+            for shard in _shard_paths(path):
+                os.remove(shard)
+        pending, shards = [], []
+        for inputs, labels in dataloader:
+            output = torch.select(model(inputs, mask=padding_mask(inputs)), 1, 0)
+            wrong = torch.argmax(output, dim=1) != labels
+            if path is None:
+                for input, label in zip(inputs[wrong].tolist(), labels[wrong].tolist()):
+                    incorrect_predictions[label].append(input)
+                continue
+            pending.append(
+                _failure_records(inputs[wrong], labels[wrong], output[wrong])
+            )
+            while sum(len(records) for records in pending) >= shard_size:
+                records = _concatenate_records(pending)
+                shards.append(_save_shard(path, len(shards), records[:shard_size]))
+                pending = [records[shard_size:]]
+        if path is None:
+            return incorrect_predictions
+        if sum(len(records) for records in pending):
+            shards.append(_save_shard(path, len(shards), _concatenate_records(pending)))
+        return shards
+
+
+def _failure_records(inputs, labels, logits):
+    """
+    Packs a batch of inputs, labels and logits into a structured array with fields "codes" (the rows of
+    `parenthesizations.pack_rows`), "length", "label" and "logits".
+    """
+    bits = (inputs[:, 1:] == 1).numpy().astype(np.uint8)
+    codes = np.packbits(bits, axis=1, bitorder="little")
+    records = np.empty(
+        len(inputs),
+        dtype=[
+            ("codes", np.uint8, (codes.shape[1],)),
+            ("length", np.uint16),
+            ("label", np.uint8),
+            ("logits", np.float32, (logits.shape[1],)),
+        ],
+    )
+    records["codes"] = codes
+    records["length"] = (inputs[:, 1:] <= 1).sum(dim=1).numpy()
+    records["label"] = labels.numpy()
+    records["logits"] = logits.numpy()
+    return records
+
+
+def _concatenate_records(records):
+    """
+    Concatenates structured arrays made by `_failure_records`, padding the codes of narrower batches with zero
+    bytes.
+    """
+    width = max(batch.dtype["codes"].shape[0] for batch in records)
+    length = sum(len(batch) for batch in records)
+    result = np.zeros(
+        length,
+        dtype=[
+            (
+                (name, (records[0].dtype[name].base, (width,)))
+                if name == "codes"
+                else (name, records[0].dtype[name])
+            )
+            for name in records[0].dtype.names
+        ],
+    )
+    start = 0
+    for batch in records:
+        stop = start + len(batch)
+        result["codes"][start:stop, : batch.dtype["codes"].shape[0]] = batch["codes"]
+        for name in batch.dtype.names[1:]:
+            result[name][start:stop] = batch[name]
+        start = stop
+    return result
+
+
+def _shard_paths(path):
+    return sorted(glob.glob(os.path.join(path, "incorrect_*.npy")))
+
+
+def _save_shard(path, index, records):
+    shard = os.path.join(path, f"incorrect_{index:05d}.npy")
+    # Write to a temporary file first so that an interrupted run never leaves a truncated shard.
+    np.save(f"{shard}.tmp.npy", records)
+    os.replace(f"{shard}.tmp.npy", shard)
+    return shard
+
+
+def load_incorrect_predictions(path, max_len=None):
+    """
+    Loads the incorrect predictions written by `incorrect_predictions` to the directory `path`.
+
+    Args:
+        path (str): The directory holding the shards.
+        max_len (int): The width of the returned inputs, defaulting to one more than the longest parenthesization.
+
+    Returns:
+        Tuple[torch.Tensor, torch.Tensor, torch.Tensor]: The inputs, encoded as by `ParenthesizationDataset`,
+            their true labels and the model's logits.
+    """
+    shards = [np.load(shard) for shard in _shard_paths(path)]
+    records = (
+        _concatenate_records(shards)
+        if shards
+        else _failure_records(
+            torch.empty((0, 1), dtype=torch.int64),
+            torch.empty(0, dtype=torch.int64),
+            torch.empty((0, 2)),
+        )
+    )
+    if max_len is None:
+        max_len = int(records["length"].max(initial=0)) + 1
+    inputs = packed_to_tensor(records["codes"], records["length"], max_len)
+    return (
+        inputs,
+        torch.from_numpy(records["label"].astype(np.int64)),
+        torch.from_numpy(np.ascontiguousarray(records["logits"])),
+    )
 
 
 def token_contributions(model, single_input):
@@ -44,20 +190,33 @@ def token_contributions(model, single_input):
     Calculates the contributions of each token in the single_input sequence to each class in the model's
     predicted output. The contribution of a single token is calculated as the difference between the
     model output with the given input and the model output with the single token changed to the other
-    parenthesis.
+    parenthesis. Every flipped copy of the input is built at once and run in a single forward pass, and a
+    whole batch of inputs (e.g. from `batch_loader`) can be passed to attribute all of them together.
 
     Args:
         model (torch.nn.Module): The model used for prediction.
-        single_input (torch.Tensor): The input sequence for which token contributions are calculated.
+        single_input (torch.Tensor): The input sequence for which token contributions are calculated, of shape
+            (seq_len,), or a batch of inputs of shape (batch_size, seq_len).
 
     Returns:
-        List[float]: A list of contributions of each token to the model's output.
+        torch.Tensor: The contribution matrix of shape (seq_len, 2), or (batch_size, seq_len, 2) for a batch,
+            whose entry [i, c] is the contribution of token i to class c. It is zero for CLS_TOKEN and PAD_TOKEN.
     """
-    output = model(single_input, mask=padding_mask(single_input))
+    model.eval()
+    inputs = single_input if single_input.dim() == 2 else single_input[None]
+
+    # Row k of `flipped` is input rows[k] with the parenthesis at positions[k] flipped.
+    rows, positions = (inputs <= 1).nonzero(as_tuple=True)
+    flipped = inputs[rows]
+    flipped[torch.arange(len(rows)), positions] = 1 - inputs[rows, positions]
+    batch = torch.cat([inputs, flipped])
+    with torch.no_grad():
+        output = torch.select(model(batch, mask=padding_mask(batch)), 1, 0)
+
+    result = output.new_zeros(inputs.shape + output.shape[-1:])
+    result[rows, positions] = output[rows] - output[len(inputs) :]
+    return result if single_input.dim() == 2 else result[0]
 
-    result = []
-    # TODO
-    return result
 
 def activations(model, dataloader):
     """
@@ -70,7 +229,15 @@ def activations(model, dataloader):
 
     Returns:
         List[int]: A list of frequencies for each hidden feature in the feedforward layer of the model.
+            Padding tokens are not counted.
     """
-    result = []
-    # TODO
-    return result
+    model.eval()
+    layer = model.encoder.layers[0]
+    layer.capture_activations()
+    try:
+        with torch.no_grad():
+            for inputs, _ in dataloader:
+                model(inputs, mask=padding_mask(inputs))
+        return layer.firing_counts.tolist()
+    finally:
+        layer.capture_activations(False)
@@ -4,45 +4,113 @@ import math
 
 
 class PositionalEncoding(nn.Module):
-    def __init__(self, d_model):
+    def __init__(self, d_model, max_len=None):
         """
         Initializes the PositionalEncoding object with the given `d_model` parameter.
 
         Parameters:
             d_model (int): The dimensionality of the embedding.
+            max_len (int): The longest sequence the encoding accepts, or None for no limit.
         """
         super().__init__()
-        max_len = 256
-        position = torch.arange(max_len, dtype=torch.float).unsqueeze(1)
-        div_term = torch.exp(
-            torch.arange(0, d_model, 2) * (-math.log(10000.0) / d_model)
-        )
-        pe = torch.zeros(1, max_len, d_model)
-        pe[0, :, 0::2] = torch.sin(position * div_term)
-        pe[0, :, 1::2] = torch.cos(position * div_term)
-        self.register_buffer("pe", pe)
+        self.d_model = d_model
+        self.max_len = max_len
+        # Tables are computed on first use, doubling in length as needed, and kept per device and dtype.
+        self.tables = {}
+
+    def table(self, length, device, dtype):
+        """
+        Returns a (rows, d_model) table of the encodings of positions 0, 1, ... with at least `length` rows.
+        """
+        if self.max_len is not None and length > self.max_len:
+            raise ValueError(
+                f"Sequences of length {length} exceed the model's max_len={self.max_len}."
+            )
+        key = (device, dtype)
+        table = self.tables.get(key)
+        if table is None or len(table) < length:
+            rows = max(16, 1 << (length - 1).bit_length())
+            if self.max_len is not None:
+                rows = min(rows, self.max_len)
+            position = torch.arange(rows, dtype=torch.float).unsqueeze(1)
+            div_term = torch.exp(
+                torch.arange(0, self.d_model, 2) * (-math.log(10000.0) / self.d_model)
+            )
+            table = torch.zeros(rows, self.d_model)
+            table[:, 0::2] = torch.sin(position * div_term)
+            table[:, 1::2] = torch.cos(position * div_term)
+            table = table.to(device=device, dtype=dtype)
+            self.tables[key] = table
+        return table
 
     def forward(self, x):
-        if len(x.shape) == 2:
-            return x + self.pe.squeeze(0)[: x.size(0)]
-        else:
-            return x + self.pe[:, : x.size(1)]
+        length = x.size(0) if len(x.shape) == 2 else x.size(1)
+        return x + self.table(length, x.device, x.dtype)[:length]
+
+    def _load_from_state_dict(self, state_dict, prefix, *args, **kwargs):
+        # Checkpoints from before the tables were computed lazily store them as a buffer.
+        state_dict.pop(prefix + "pe", None)
+        super()._load_from_state_dict(state_dict, prefix, *args, **kwargs)
 
 
 class CustomTransformerEncoderLayer(nn.TransformerEncoderLayer):
     def __init__(self, *args, **kwargs):
         super().__init__(*args, **kwargs)
-        self.activations = []
+        self.firing_counts = None
+        self.token_count = 0
+        self._hooks = []
+        self._padding_mask = None
+
+    @property
+    def capturing(self):
+        return bool(self._hooks)
 
-    def _ff_block(self, x):
-        x = self.linear1(x)
-        x = self.activation(x)
-        self.activations = x > 0
-        return self.dropout2(self.linear2(self.dropout(x)))
+    def capture_activations(self, enabled=True):
+        """
+        Starts (or stops) counting how often each hidden feature of the feedforward block fires, i.e. is positive
+        after the activation. Only the counts are kept: `firing_counts[i]` is the number of non-padding tokens on
+        which feature i fired and `token_count` is the number of non-padding tokens seen. Enabling resets both.
+        Capturing is off by default, which lets the layer use PyTorch's fused fast path; a capturing layer
+        runs the regular path instead.
+
+        Parameters:
+            enabled (bool): Whether to capture activations.
+        """
+        for hook in self._hooks:
+            hook.remove()
+        self._hooks = []
+        self._padding_mask = None
+        if enabled:
+            self.firing_counts = torch.zeros(
+                self.linear1.out_features,
+                dtype=torch.int64,
+                device=self.linear1.weight.device,
+            )
+            self.token_count = 0
+            self._hooks = [
+                self.register_forward_pre_hook(self._remember_mask, with_kwargs=True),
+                self.dropout.register_forward_pre_hook(self._count_firing),
+            ]
+
+    def _remember_mask(self, module, args, kwargs):
+        self._padding_mask = kwargs.get("src_key_padding_mask")
+
+    def _count_firing(self, module, inputs):
+        # The feedforward block applies `self.dropout` to the activations only, so its input is exactly them.
+        fired = inputs[0].reshape(-1, inputs[0].shape[-1]) > 0
+        mask = self._padding_mask
+        if mask is None:
+            tokens = fired.new_ones(len(fired))
+        else:
+            # The encoder may have turned a boolean mask into an additive one with -inf at padding.
+            tokens = ~mask if mask.dtype == torch.bool else mask == 0
+            tokens = tokens.reshape(-1)
+        self.firing_counts += fired[tokens].sum(dim=0)
+        self.token_count += int(tokens.sum())
 
 
 class Model(nn.Module):
-    def __init__(self, n_vocab, d_model, nhead, num_layers):
+    def __init__(self, n_vocab, d_model, nhead, num_layers, max_len=None):
         """
         Initializes the Model object with the specified parameters.
 
@@ -51,11 +119,12 @@ class Model(nn.Module):
             d_model (int): The dimensionality of the embedding.
             nhead (int): The number of heads in the encoder.
             num_layers (int): The number of nn.TransformerEncoderLayer in nn.TransformerEncoder.
+            max_len (int): The longest input sequence, or None for no limit.
         """
         super().__init__()
         self.d_model = d_model
         self.embed = nn.Embedding(n_vocab, d_model)
-        self.positional = PositionalEncoding(d_model)
+        self.positional = PositionalEncoding(d_model, max_len)
         self.encoder = nn.TransformerEncoder(
             CustomTransformerEncoderLayer(
                 d_model=d_model, nhead=nhead, batch_first=True, dropout=0.0
@@ -63,7 +132,19 @@ class Model(nn.Module):
             num_layers=num_layers,
         )
         self.proj = nn.Linear(d_model, 2)
-        self.activations = None
+
+    def capture_activations(self, enabled=True, layers=None):
+        """
+        Turns activation capture (see `CustomTransformerEncoderLayer.capture_activations`) on or off for the
+        given encoder layers.
+
+        Parameters:
+            enabled (bool): Whether to capture activations.
+            layers (List[int]): The indices of the encoder layers, defaulting to all of them.
+        """
+        layers = range(len(self.encoder.layers)) if layers is None else layers
+        for i in layers:
+            self.encoder.layers[i].capture_activations(enabled)
 
     def forward(self, x, mask=None):
         """
@@ -78,7 +159,15 @@ class Model(nn.Module):
         """
         x = self.embed(x) / math.sqrt(self.d_model)
         x = self.positional(x)
-        x = self.encoder(x, src_key_padding_mask=mask)
-        self.activations = self.encoder.layers[0].activations
+        if any(layer.capturing for layer in self.encoder.layers):
+            # The encoder may pack a padded batch into a nested tensor, which the hooks of a capturing layer
+            # cannot count, so its layers are run one by one. Each capturing layer skips its own fused fast
+            # path because it has hooks, while the other layers (and other models) keep theirs.
+            for layer in self.encoder.layers:
+                x = layer(x, src_key_padding_mask=mask)
+            if self.encoder.norm is not None:
+                x = self.encoder.norm(x)
+        else:
+            x = self.encoder(x, src_key_padding_mask=mask)
         x = self.proj(x)
         return x
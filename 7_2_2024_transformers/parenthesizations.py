@@ -1,8 +1,12 @@
+import collections
 import itertools
-import functools
+import os
+import numpy as np
+
+# Packed parenthesizations store one word per 64-bit integer, where bit i is 1 if character i is ")".
+MAX_PACKED_LENGTH = 64
 
 
-@functools.lru_cache(maxsize=None)
 def valid(n):
     """
     Returns a list of all possible parenthesizations of length n.
@@ -17,15 +21,111 @@ def valid(n):
     >>> parenthesizations(3)
     {'((()))', '(()())', '(())()', '()(())', '()()()'}
     """
-    if n == 0:
-        return set([""])
-    else:
-        result = set()
+    codes = VALID_TABLE[n]
+    return set(unpack(codes, np.full(len(codes), 2 * n)))
+
+
+class ValidTable:
+    """
+    A table of the packed valid parenthesizations of each length, computed level by level as
+    "(" + c + ")" + d. Computing a level fetches or computes each lower level once. Levels are kept in
+    memory up to `max_bytes`, evicting the least recently used ones that no computation in progress
+    needs, and are optionally saved to `cache_dir` so that later runs memory-map them instead of
+    recomputing them.
+    """
+
+    def __init__(self, max_bytes=2**30, cache_dir=None):
+        """
+        Parameters:
+          max_bytes (int): The most memory the cached levels may use. Levels larger than this are
+            returned without being cached.
+          cache_dir (str): A directory to save levels to and load them from, or None to stay in memory.
+        """
+        self.max_bytes = max_bytes
+        self.cache_dir = cache_dir
+        self.levels = collections.OrderedDict()
+        self.nbytes = 0
+        self.pinned = 0
+
+    def __getitem__(self, n):
+        """
+        Returns a read-only uint64 array of the packed valid parenthesizations of length 2n.
+        """
+        if n in self.levels:
+            self.levels.move_to_end(n)
+            return self.levels[n]
+        # Every level below n is needed to compute level n, so they are fetched (or computed) once each,
+        # bottom up, and kept in `lower` instead of being looked up in the cache again.
+        lower = []
+        self.pinned = n
+        try:
+            for m in range(n + 1):
+                lower.append(self._level(m, lower))
+        finally:
+            self.pinned = 0
+            self._evict()
+        return lower[n]
+
+    def _level(self, n, lower):
+        if n in self.levels:
+            self.levels.move_to_end(n)
+            return self.levels[n]
+        codes = self._load(n)
+        if codes is None:
+            codes = self._compute(n, lower)
+            codes.flags.writeable = False
+            self._save(n, codes)
+        self._store(n, codes)
+        return codes
+
+    def _compute(self, n, lower):
+        if n == 0:
+            return np.zeros(1, dtype=np.uint64)
+        parts = []
         for i in range(n):
-            for c in valid(i):
-                for d in valid(n - i - 1):
-                    result.add("(" + c + ")" + d)
-        return result
+            c, d = lower[i], lower[n - i - 1]
+            closing = np.uint64(1 << (2 * i + 1))
+            shift = np.uint64(2 * i + 2)
+            parts.append(
+                ((c[:, None] << np.uint64(1)) | closing | (d[None, :] << shift)).ravel()
+            )
+        return np.concatenate(parts)
+
+    def _path(self, n):
+        return os.path.join(self.cache_dir, f"valid_{n}.npy")
+
+    def _load(self, n):
+        if self.cache_dir is None or not os.path.exists(self._path(n)):
+            return None
+        return np.load(self._path(n), mmap_mode="r")
+
+    def _save(self, n, codes):
+        if self.cache_dir is None:
+            return
+        os.makedirs(self.cache_dir, exist_ok=True)
+        # Write to a temporary file first so that other processes never see a partial level.
+        temporary = f"{self._path(n)}.{os.getpid()}.tmp"
+        with open(temporary, "wb") as file:
+            np.save(file, codes)
+        os.replace(temporary, self._path(n))
+
+    def _store(self, n, codes):
+        if codes.nbytes > self.max_bytes:
+            return
+        self.levels[n] = codes
+        self.nbytes += codes.nbytes
+        self._evict()
+
+    def _evict(self):
+        # Levels below `pinned` are held by the computation in progress, so evicting them would free nothing.
+        for level in list(self.levels):
+            if self.nbytes <= self.max_bytes:
+                break
+            if level >= self.pinned:
+                self.nbytes -= self.levels.pop(level).nbytes
+
+
+VALID_TABLE = ValidTable()
 
 
 def all(n):
@@ -50,3 +150,373 @@ def all_balanced(n):
         "".join(["(" if i in pos else ")" for i in range(2 * n)])
         for pos in itertools.combinations(range(2 * n), n)
     )
+
+
+def pack(parenthesizations):
+    """
+    Packs parenthesizations of length at most MAX_PACKED_LENGTH into 64-bit integers.
+
+    Parameters:
+      parenthesizations (Iterable[str]): The parenthesizations to pack.
+
+    Returns:
+      Tuple[np.ndarray, np.ndarray]: A uint64 array of codes, where bit i is 1 if character i is ")",
+      and a uint8 array of the lengths of the parenthesizations.
+
+    Example:
+    >>> pack(["(())", "()"])
+    (array([12,  2], dtype=uint64), array([4, 2], dtype=uint8))
+    """
+    parenthesizations = list(parenthesizations)
+    lengths = np.fromiter(
+        (len(p) for p in parenthesizations),
+        dtype=np.uint8,
+        count=len(parenthesizations),
+    )
+    if len(lengths) and lengths.max() > MAX_PACKED_LENGTH:
+        raise ValueError(
+            f"Parenthesizations longer than {MAX_PACKED_LENGTH} characters cannot be packed."
+        )
+    data = "".join(p.ljust(MAX_PACKED_LENGTH, "(") for p in parenthesizations)
+    bits = np.frombuffer(data.encode("ascii"), dtype=np.uint8) - ord("(")
+    return pack_bits(bits.reshape(len(parenthesizations), MAX_PACKED_LENGTH)), lengths
+
+
+def pack_bits(bits):
+    """
+    Packs a (batch, width) array with 0 for "(" and 1 for ")" into 64-bit integers, the inverse of `unpack_bits`.
+    """
+    bits = np.asarray(bits, dtype=np.uint8)
+    padded = np.zeros((len(bits), MAX_PACKED_LENGTH), dtype=np.uint8)
+    padded[:, : bits.shape[1]] = bits
+    codes = np.packbits(padded, axis=1, bitorder="little").view("<u8").ravel()
+    return codes.astype(np.uint64)
+
+
+def unpack_bits(codes, width=MAX_PACKED_LENGTH):
+    """
+    Returns the first `width` characters of packed parenthesizations as a (batch, width) uint8 array
+    with 0 for "(" and 1 for ")".
+    """
+    codes = np.ascontiguousarray(codes, dtype="<u8")
+    bits = np.unpackbits(codes.view(np.uint8).reshape(-1, 8), axis=1, bitorder="little")
+    return bits[:, :width]
+
+
+def unpack(codes, lengths):
+    """
+    Unpacks codes made by `pack` back into a list of strings.
+
+    Example:
+    >>> unpack(*pack(["(())", "()"]))
+    ['(())', '()']
+    """
+    data = (unpack_bits(codes) + ord("(")).tobytes().decode("ascii")
+    return [
+        data[i * MAX_PACKED_LENGTH : i * MAX_PACKED_LENGTH + int(length)]
+        for i, length in enumerate(lengths)
+    ]
+
+
+def pack_rows(parenthesizations):
+    """
+    Packs parenthesizations of any length into rows of bytes, with bit i of a row (in little-endian bit
+    order) set if character i is ")". For words of at most 64 characters a row holds the same bits as the
+    code made by `pack`.
+
+    Parameters:
+      parenthesizations (Iterable[str]): The parenthesizations to pack.
+
+    Returns:
+      Tuple[np.ndarray, np.ndarray]: A (batch, ceil(longest length / 8)) uint8 array of rows and a uint16
+      array of the lengths of the parenthesizations.
+
+    Example:
+    >>> pack_rows(["(())", "()"])
+    (array([[12],
+           [ 2]], dtype=uint8), array([4, 2], dtype=uint16))
+    """
+    parenthesizations = list(parenthesizations)
+    lengths = np.fromiter(
+        (len(p) for p in parenthesizations),
+        dtype=np.uint16,
+        count=len(parenthesizations),
+    )
+    width = 8 * -(-int(lengths.max(initial=0)) // 8)
+    data = "".join(p.ljust(width, "(") for p in parenthesizations)
+    bits = np.frombuffer(data.encode("ascii"), dtype=np.uint8) - ord("(")
+    rows = np.packbits(
+        bits.reshape(len(parenthesizations), width), axis=1, bitorder="little"
+    )
+    return rows, lengths
+
+
+def unpack_rows(rows, width):
+    """
+    Returns the first `width` characters of rows made by `pack_rows` (or of codes made by `pack`) as a
+    (batch, width) uint8 array with 0 for "(" and 1 for ")". Characters past the end of a row are 0.
+    """
+    rows = np.asarray(rows)
+    if rows.ndim == 1:
+        rows = np.ascontiguousarray(rows, dtype="<u8").view(np.uint8).reshape(-1, 8)
+    return np.unpackbits(rows, axis=1, count=width, bitorder="little")
+
+
+def depth_profiles(codes, lengths, width=None):
+    """
+    Computes the depth after each character of packed parenthesizations.
+
+    Parameters:
+      codes (np.ndarray): The packed parenthesizations.
+      lengths (np.ndarray): The lengths of the parenthesizations.
+      width (int): The number of characters to compute depths for. Defaults to the longest length.
+
+    Returns:
+      np.ndarray: A (batch, width) int8 array of depths, which stay at the final depth past the end
+      of each parenthesization.
+
+    Example:
+    >>> depth_profiles(*pack(["(())", "))"]))
+    array([[ 1,  2,  1,  0],
+           [-1, -2, -2, -2]], dtype=int8)
+    """
+    lengths = np.asarray(lengths)
+    if width is None:
+        width = int(lengths.max()) if len(lengths) else 0
+    steps = 1 - 2 * unpack_bits(codes, width).astype(np.int8)
+    steps[np.arange(width) >= lengths[:, None]] = 0
+    return np.cumsum(steps, axis=1, dtype=np.int8)
+
+
+def is_valid(codes, lengths):
+    """
+    Checks which packed parenthesizations are valid.
+
+    Returns:
+      np.ndarray: A boolean array that is True where the parenthesization never goes below depth 0
+      and ends at depth 0.
+
+    Example:
+    >>> is_valid(*pack(["(())", "())(", "(("]))
+    array([ True, False, False])
+    """
+    depths = depth_profiles(codes, lengths)
+    if depths.shape[1] == 0:
+        return np.ones(len(depths), dtype=bool)
+    return (depths.min(axis=1) >= 0) & (depths[:, -1] == 0)
+
+
+def valid_packed(n):
+    """
+    Returns the packed valid parenthesizations of length 2n from `VALID_TABLE`, without going through strings.
+
+    Example:
+    >>> unpack(valid_packed(2), [4, 4])
+    ['()()', '(())']
+    """
+    return VALID_TABLE[n]
+
+
+def all_packed(n):
+    """
+    Returns the packed strings of "(" and ")" of length 2n.
+    """
+    return np.arange(4**n, dtype=np.uint64)
+
+
+def all_balanced_packed(n):
+    """
+    Returns the packed strings of length 2n with n of each parenthesis.
+    """
+    opens = np.array(list(itertools.combinations(range(2 * n), n)), dtype=np.uint64)
+    full = np.uint64((1 << (2 * n)) - 1)
+    return full ^ np.bitwise_or.reduce(np.uint64(1) << opens, axis=1)
+
+
+# Classes of words produced by `sample_packed`.
+VALID = 0
+INVALID_BALANCED = 1
+INVALID_UNBALANCED = 2
+
+
+def _length_mask(n):
+    return np.uint64((1 << (2 * n)) - 1) if n < 32 else np.uint64(2**64 - 1)
+
+
+def _balanced(codes, n):
+    return unpack_bits(codes, 2 * n).sum(axis=1) == n
+
+
+def _check_packed_length(n):
+    if 2 * n > MAX_PACKED_LENGTH:
+        raise ValueError(
+            f"Parenthesizations of length {2 * n} do not fit in {MAX_PACKED_LENGTH} bits."
+        )
+
+
+def _check_invalid_exists(n, size):
+    if n == 0 and size > 0:
+        raise ValueError(
+            "The empty word is valid, so there are no invalid parenthesizations of length 0."
+        )
+
+
+def random_packed(n, size, rng=None):
+    """
+    Samples packed strings of "(" and ")" of length 2n uniformly at random.
+    """
+    _check_packed_length(n)
+    rng = np.random.default_rng(rng)
+    codes = rng.integers(0, 2**64 - 1, size=size, dtype=np.uint64, endpoint=True)
+    return codes & _length_mask(n)
+
+
+def random_balanced_packed(n, size, rng=None):
+    """
+    Samples packed strings with n of each parenthesis uniformly at random.
+    """
+    _check_packed_length(n)
+    rng = np.random.default_rng(rng)
+    order = rng.permuted(np.tile(np.arange(2 * n), (size, 1)), axis=1)
+    return pack_bits(order >= n)
+
+
+def random_valid_packed(n, size, rng=None):
+    """
+    Samples packed valid parenthesizations of length 2n uniformly at random in O(n) time each.
+
+    A uniformly random arrangement of n "(" and n + 1 ")" has exactly one rotation whose depth first goes
+    below 0 at the last character, namely the one starting just after the first lowest point. Dropping that
+    last ")" leaves a uniformly random valid parenthesization (the cycle lemma).
+    """
+    _check_packed_length(n)
+    rng = np.random.default_rng(rng)
+    order = rng.permuted(np.tile(np.arange(2 * n + 1), (size, 1)), axis=1)
+    steps = np.where(order < n, 1, -1).astype(np.int8)
+    lowest = np.argmin(np.cumsum(steps, axis=1), axis=1)
+    rotation = (lowest[:, None] + 1 + np.arange(2 * n)) % (2 * n + 1)
+    return pack_bits(np.take_along_axis(steps, rotation, axis=1) < 0)
+
+
+def _rejection_sample(sample, accept, size):
+    """
+    Repeatedly draws batches with `sample(count)` and keeps the codes where `accept` is True until there
+    are `size` of them.
+    """
+    result = []
+    found = 0
+    while found < size:
+        # Oversample a little so that most requests finish in one round.
+        codes = sample(2 * (size - found) + 16)
+        codes = codes[accept(codes)]
+        result.append(codes[: size - found])
+        found += len(result[-1])
+    return np.concatenate(result) if result else np.zeros(0, dtype=np.uint64)
+
+
+def random_invalid_packed(n, size, rng=None):
+    """
+    Samples packed invalid parenthesizations of length 2n uniformly at random.
+    """
+    _check_packed_length(n)
+    _check_invalid_exists(n, size)
+    rng = np.random.default_rng(rng)
+    lengths = np.full(1, 2 * n)
+    return _rejection_sample(
+        lambda count: random_packed(n, count, rng),
+        lambda codes: ~is_valid(codes, np.broadcast_to(lengths, codes.shape)),
+        size,
+    )
+
+
+def random_invalid_balanced_packed(n, size, rng=None):
+    """
+    Samples packed invalid parenthesizations with n of each parenthesis uniformly at random.
+    """
+    _check_packed_length(n)
+    _check_invalid_exists(n, size)
+    rng = np.random.default_rng(rng)
+    lengths = np.full(1, 2 * n)
+    return _rejection_sample(
+        lambda count: random_balanced_packed(n, count, rng),
+        lambda codes: ~is_valid(codes, np.broadcast_to(lengths, codes.shape)),
+        size,
+    )
+
+
+def random_invalid_unbalanced_packed(n, size, rng=None):
+    """
+    Samples packed strings of length 2n with different numbers of "(" and ")" uniformly at random.
+    """
+    _check_packed_length(n)
+    _check_invalid_exists(n, size)
+    rng = np.random.default_rng(rng)
+    return _rejection_sample(
+        lambda count: random_packed(n, count, rng),
+        lambda codes: ~_balanced(codes, n),
+        size,
+    )
+
+
+def sample_packed(n, size, ratios=(0.5, 0.25, 0.25), rng=None):
+    """
+    Samples a shuffled mix of valid, invalid balanced and invalid unbalanced parenthesizations of length 2n
+    without enumerating all of them, so it works up to n = 32.
+
+    Parameters:
+      n (int): Half the length of the parenthesizations.
+      size (int): The number of parenthesizations to sample.
+      ratios (Tuple[float]): The fractions of VALID, INVALID_BALANCED and INVALID_UNBALANCED words.
+      rng: A seed or np.random.Generator.
+
+    Returns:
+      Tuple[np.ndarray, np.ndarray]: The packed parenthesizations and the class of each one.
+    """
+    _check_packed_length(n)
+    # Only the invalid classes can be empty, so check them before drawing the class counts.
+    _check_invalid_exists(n, size * (ratios[1] + ratios[2]))
+    rng = np.random.default_rng(rng)
+    counts = rng.multinomial(size, np.array(ratios) / sum(ratios))
+    samplers = (
+        random_valid_packed,
+        random_invalid_balanced_packed,
+        random_invalid_unbalanced_packed,
+    )
+    codes = np.concatenate(
+        [sampler(n, count, rng) for sampler, count in zip(samplers, counts)]
+    )
+    classes = np.repeat(np.arange(len(counts)), counts)
+    order = rng.permutation(size)
+    return codes[order], classes[order]
+
+
+def iter_packed(n, kind="invalid", chunk_size=2**20):
+    """
+    Streams every packed string of length 2n of one class in chunks, using memory proportional to
+    `chunk_size` instead of 4^n.
+
+    Parameters:
+      n (int): Half the length of the parenthesizations.
+      kind (str): One of "all", "valid", "invalid", "invalid_balanced" or "invalid_unbalanced".
+      chunk_size (int): The number of candidate strings checked per chunk.
+
+    Returns:
+      Generator[np.ndarray]: Arrays of packed parenthesizations in increasing order of their codes.
+    """
+    lengths = np.full(chunk_size, 2 * n)
+    for start in range(0, 4**n, chunk_size):
+        codes = np.arange(start, min(start + chunk_size, 4**n), dtype=np.uint64)
+        if kind == "all":
+            yield codes
+            continue
+        valid_mask = is_valid(codes, lengths[: len(codes)])
+        if kind == "valid":
+            yield codes[valid_mask]
+        elif kind == "invalid":
+            yield codes[~valid_mask]
+        elif kind == "invalid_balanced":
+            yield codes[~valid_mask & _balanced(codes, n)]
+        elif kind == "invalid_unbalanced":
+            yield codes[~_balanced(codes, n)]
+        else:
+            raise ValueError(f"Unknown kind of parenthesization {kind!r}.")